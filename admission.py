@@ -0,0 +1,189 @@
+import asyncio
+import os
+from collections import deque
+from contextlib import suppress
+from typing import Optional
+
+from fast_json import FastJSONResponse
+from metrics import registry, Counter, Gauge, Histogram
+
+# On by default: without it, an overload queues every request on the database until all of them time out
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+# Longest a request waits for a slot before it is shed
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "1000")) / 1000
+# Once the oldest queued request has waited this long, new ones are shed right away instead of queued
+ADMISSION_QUEUE_TARGET = float(os.getenv("ADMISSION_QUEUE_TARGET_MS", "250")) / 1000
+# Retry-After sent with a shed request, in seconds
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+# (concurrent requests, queued requests) per request class; see request_class
+ADMISSION_DEFAULTS = {
+    "read": (64, 256),
+    "scan": (8, 32),
+    "write": (16, 64),
+    "bulk": (2, 4),
+    "export": (4, 8),
+}
+
+admission_shed = registry.register(Counter(
+    "admission_shed_total", "Requests answered 503 by admission control, by class and reason.", ("class", "reason")))
+admission_queue_wait = registry.register(Histogram(
+    "admission_queue_wait_seconds", "Time admitted requests waited for a slot, by class.", ("class",)))
+
+
+def request_class(method: str, path: str) -> Optional[str]:
+    """The budget a request counts against, or None for requests admission control leaves alone.
+
+    ``read`` is a single project by ID; ``scan`` is any other read of the projects (list, search,
+    stats, timeline); ``write`` is a single-project write, ``bulk`` the bulk writes and imports and
+    ``export`` the exports, which hold a slot for as long as they stream. The change feed is exempt:
+    its subscriptions are meant to stay open.
+    """
+
+    if path != "/projects" and not path.startswith("/projects/"):
+        return None
+    resource = path[len("/projects"):].strip("/")
+    if method == "OPTIONS" or resource == "changes":
+        return None
+    if resource == "export":
+        return "export"
+    if resource in ("bulk", "import"):
+        return "bulk"
+    if method in ("GET", "HEAD"):
+        return "read" if resource.isdigit() else "scan"
+    return "write"
+
+
+class Overloaded(Exception):
+    """A request was shed; ``reason`` is ``queue_full``, ``latency`` or ``timeout``."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionBudget:
+    """Concurrency limit with a bounded FIFO queue, for one class of requests.
+
+    Up to ``limit`` requests run at once; the next ``max_queue`` wait for a slot, at most ``timeout``
+    seconds each. A request is shed when the queue is full, when it waits out its timeout, or when
+    the oldest queued request has already waited longer than ``target``: the queue isn't draining,
+    so queueing more only adds latency. Admitted requests therefore wait at most ``timeout``.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float = ADMISSION_QUEUE_TIMEOUT,
+                 target: float = ADMISSION_QUEUE_TARGET):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.target = target
+        self.active = 0
+        # (enqueued at, future resolved with the slot)
+        self._waiters = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> float:
+        """Take a slot, waiting in the queue if needed; return the seconds waited or raise Overloaded."""
+
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            raise Overloaded("queue_full")
+        loop = asyncio.get_running_loop()
+        enqueued = loop.time()
+        if self._waiters and enqueued - self._waiters[0][0] > self.target:
+            raise Overloaded("latency")
+        waiter = (enqueued, loop.create_future())
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], self.timeout)
+        except asyncio.TimeoutError:
+            if not (waiter[1].done() and not waiter[1].cancelled()):
+                with suppress(ValueError):
+                    self._waiters.remove(waiter)
+                raise Overloaded("timeout")
+            # The slot was handed over just as the wait timed out (wait_for may report the timeout
+            # anyway since Python 3.12); it is ours, so keep it
+        except BaseException:
+            # e.g. the client went away
+            if waiter[1].done() and not waiter[1].cancelled():
+                # The slot was handed over just as we gave up
+                self.release()
+            else:
+                with suppress(ValueError):
+                    self._waiters.remove(waiter)
+            raise
+        return loop.time() - enqueued
+
+    def release(self):
+        """Give the slot to the longest waiting request, or free it."""
+
+        while self._waiters:
+            _, future = self._waiters.popleft()
+            if not future.done():
+                # The slot passes on; active stays the same
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+def create_budgets() -> dict:
+    """Budgets per request class from ``ADMISSION_<CLASS>_CONCURRENCY`` and ``ADMISSION_<CLASS>_QUEUE``."""
+
+    return {
+        name: AdmissionBudget(
+            name,
+            limit=int(os.getenv(f"ADMISSION_{name.upper()}_CONCURRENCY", str(limit))),
+            max_queue=int(os.getenv(f"ADMISSION_{name.upper()}_QUEUE", str(max_queue))),
+        )
+        for name, (limit, max_queue) in ADMISSION_DEFAULTS.items()
+    }
+
+
+admission_budgets = create_budgets()
+
+registry.register(Gauge(
+    "admission_requests", "Requests by admission class: running (active), waiting (queued) and the limit.",
+    ("class", "state"),
+    lambda: [((name, state), value) for name, budget in admission_budgets.items()
+             for state, value in (("active", budget.active), ("queued", budget.queued), ("limit", budget.limit))],
+))
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests against the budget of their class (see ``request_class``).
+
+    Requests over budget get a fast 503 with ``Retry-After`` instead of queueing on the database, so
+    an overload fails some requests quickly and the admitted ones keep their latency. Budgets are
+    per process.
+    """
+
+    def __init__(self, app, budgets: Optional[dict] = None, retry_after: int = ADMISSION_RETRY_AFTER):
+        self.app = app
+        self.budgets = budgets if budgets is not None else admission_budgets
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        budget = self.budgets.get(request_class(scope["method"], scope["path"])) if scope["type"] == "http" else None
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            waited = await budget.acquire()
+        except Overloaded as e:
+            admission_shed.inc(budget.name, e.reason)
+            await FastJSONResponse(
+                {"detail": "The server is too busy to handle this request. Please retry shortly."},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)},
+            )(scope, receive, send)
+            return
+        admission_queue_wait.observe(waited, budget.name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release()
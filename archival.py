@@ -0,0 +1,44 @@
+import asyncio
+import logging
+import os
+from datetime import timedelta
+
+from database import shards
+from services import archive_deleted_projects_service, prune_changes_service
+
+logger = logging.getLogger(__name__)
+
+# Seconds between archival runs; 0 disables the background job
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+# Soft-deleted projects are kept in the hot table for this long before being archived
+ARCHIVE_RETENTION = timedelta(days=float(os.getenv("ARCHIVE_RETENTION_DAYS", "30")))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# The archival job also drops change-log entries older than this
+CHANGE_LOG_RETENTION = timedelta(days=float(os.getenv("CHANGE_LOG_RETENTION_DAYS", "7")))
+
+
+async def archive_deleted_projects(retention: timedelta = ARCHIVE_RETENTION, batch_size: int = ARCHIVE_BATCH_SIZE):
+    """Run one archival pass on every shard, each with its own session; return the number of archived projects."""
+
+    archived = pruned = 0
+    for shard in shards:
+        async with shard.sessions() as db:
+            archived += await archive_deleted_projects_service(db=db, older_than=retention, batch_size=batch_size)
+            pruned += await prune_changes_service(db=db, older_than=CHANGE_LOG_RETENTION, batch_size=batch_size)
+    if archived:
+        logger.info(f"Archived {archived} deleted projects.")
+    if pruned:
+        logger.info(f"Pruned {pruned} change-log entries.")
+    return archived
+
+
+async def archive_periodically(interval: float = ARCHIVE_INTERVAL):
+    """Background task: archive old soft-deleted projects every ``interval`` seconds until cancelled."""
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await archive_deleted_projects()
+        except Exception as e:
+            # Keep the job alive; the next run retries
+            logger.error(f"Error archiving deleted projects: {str(e)}")
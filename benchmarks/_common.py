@@ -0,0 +1,93 @@
+"""Shared helpers for the benchmark scripts."""
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker  # noqa: E402
+
+from database import configure_sqlite_engine, sqlite_profile  # noqa: E402
+from models import Base, ProjectManagementSystem  # noqa: E402
+
+
+def project_rows(count, start=1):
+    """Build ``count`` insertable project rows."""
+
+    return [
+        {
+            "project_name": f"Project {i}",
+            "project_description": "Benchmark project",
+            "project_start_date": date(2024, 1, 1),
+            "project_end_date": date(2024, 12, 31),
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def seed(db_path, rows):
+    """Create the schema in ``db_path`` and insert ``rows`` projects."""
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(ProjectManagementSystem.__table__.insert(), project_rows(rows))
+    engine.dispose()
+
+
+@asynccontextmanager
+async def temp_database(rows=0, pool_size=64, profile=sqlite_profile):
+    """Yield an async session factory bound to a freshly seeded throwaway database."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed(db_path, rows)
+        engine = configure_sqlite_engine(
+            create_async_engine(f"sqlite+aiosqlite:///{db_path}", pool_size=pool_size, max_overflow=0),
+            profile,
+        )
+        try:
+            yield async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        finally:
+            await engine.dispose()
+
+
+@asynccontextmanager
+async def read_only_sessions(session_factory, pool_size=64, profile=sqlite_profile):
+    """Yield a session factory for the same database as ``session_factory``, set up like the app's
+    read engine: read-only connections that never take the write lock."""
+
+    url = session_factory.kw["bind"].url
+    engine = configure_sqlite_engine(create_async_engine(url, pool_size=pool_size, max_overflow=0), profile,
+                                     read_only=True)
+    try:
+        yield async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+def override_databases(app, session_factory, read_session_factory=None):
+    """Point the write session dependency of ``app`` at ``session_factory`` and the read one at
+    ``read_session_factory`` (``session_factory`` when not given), as well as the change feed."""
+
+    from change_feed import change_feed
+    from database import get_async_db, get_async_read_db, get_async_shard_dbs, get_async_shard_read_dbs
+
+    def override_with(factory, as_list=False):
+        async def override():
+            async with factory() as db:
+                yield [db] if as_list else db
+        return override
+
+    app.dependency_overrides[get_async_db] = override_with(session_factory)
+    app.dependency_overrides[get_async_read_db] = override_with(read_session_factory or session_factory)
+    # A single shard
+    app.dependency_overrides[get_async_shard_dbs] = override_with(session_factory, as_list=True)
+    app.dependency_overrides[get_async_shard_read_dbs] = override_with(read_session_factory or session_factory,
+                                                                      as_list=True)
+    # The feed opens its own sessions rather than taking them from a dependency
+    change_feed.session_factory = read_session_factory or session_factory
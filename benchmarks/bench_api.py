@@ -0,0 +1,279 @@
+"""Benchmark suite for every route of the projects API.
+
+Seeds a throwaway SQLite database with ``--rows`` projects and drives each
+route in ``projects_routes.py`` through the in-process ASGI transport with
+``--concurrency`` concurrent clients, ``--requests`` requests per scenario.
+Reads run first, then writes; the delete scenarios remove projects created
+by the create scenarios, so the seeded rows stay in place.
+
+For every scenario it reports throughput, p50/p95/p99 latency, failed
+requests (any status >= 400) and process memory: resident set size after
+the scenario and peak RSS so far. ``--trace-memory`` also records the peak of
+Python allocations per scenario with tracemalloc, which slows requests down.
+It also cold-starts ``--cold-starts`` fresh interpreters and records the
+median time from process start to the first response (see bench_startup.py).
+
+Results are written as JSON (``--output``, by default
+``benchmarks/results/<timestamp>-<commit>.json``). Pass ``--baseline`` with an
+earlier result file to print the change per scenario; with
+``--max-regression`` the run fails when throughput drops or p95 (or the time
+to first response) grows by more than that percentage.
+
+Usage:
+    python benchmarks/bench_api.py --rows 10000 --requests 500 --concurrency 16
+    python benchmarks/bench_api.py --baseline benchmarks/results/<earlier>.json --max-regression 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import httpx
+
+# Measure the routes themselves: admission control would shed the concurrent bulk requests
+os.environ["ADMISSION_CONTROL"] = "false"
+
+from _common import temp_database, read_only_sessions, override_databases  # noqa: E402
+from bench_startup import measure_cold_start  # noqa: E402
+from main_app import app  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BULK_SIZE = 50
+NEW_PROJECT = {
+    "project_name": "Benchmark project",
+    "project_description": "Created by the benchmark suite",
+    "project_start_date": "2024-01-01",
+    "project_end_date": "2024-12-31",
+}
+IMPORT_CSV = "project_name,project_description,project_start_date,project_end_date\n" + "".join(
+    f"Imported project {i},Imported by the benchmark suite,2024-01-01,2024-12-31\n" for i in range(BULK_SIZE)
+)
+
+
+def build_scenarios(rows):
+    """Return ``(name, make_request)`` pairs; ``make_request(state)`` returns ``(method, url, kwargs)``."""
+
+    def random_id(state):
+        return random.randint(1, rows)
+
+    return [
+        ("GET /projects/{id}", lambda state: ("GET", f"/projects/{random_id(state)}", {})),
+        ("GET /projects/", lambda state: ("GET", f"/projects/?limit=100&after={random_id(state)}", {})),
+        ("GET /projects/?format=ndjson", lambda state: (
+            "GET", f"/projects/?format=ndjson&after={max(rows - 1000, 0)}", {})),
+        ("GET /projects/export", lambda state: (
+            "GET", f"/projects/export?format=csv&after={max(rows - 1000, 0)}", {})),
+        ("GET /projects/search", lambda state: (
+            "GET", f"/projects/search?q=project {random.randint(1, 999)}", {})),
+        ("GET /projects/stats", lambda state: ("GET", "/projects/stats", {})),
+        ("GET /projects/timeline", lambda state: (
+            "GET", f"/projects/timeline?on=2024-{random.randint(1, 12):02d}-15&after={random_id(state)}", {})),
+        # A long poll that doesn't wait: the backlog after a random position in the seeded creates
+        ("GET /projects/changes", lambda state: (
+            "GET", f"/projects/changes?format=json&timeout=0&after={random_id(state) - 1}", {})),
+        ("PUT /projects/{id}", lambda state: (
+            "PUT", f"/projects/{random_id(state)}", {"json": {"project_name": f"Renamed {random.random()}"}})),
+        ("PATCH /projects/bulk", lambda state: (
+            "PATCH", "/projects/bulk",
+            {"json": [{"id": random_id(state), "project_description": "Bulk updated"} for _ in range(BULK_SIZE)]})),
+        ("POST /projects/", lambda state: ("POST", "/projects/", {"json": NEW_PROJECT})),
+        ("POST /projects/bulk", lambda state: ("POST", "/projects/bulk", {"json": [NEW_PROJECT] * BULK_SIZE})),
+        ("POST /projects/import", lambda state: (
+            "POST", "/projects/import", {"content": IMPORT_CSV, "headers": {"Content-Type": "text/csv"}})),
+        ("DELETE /projects/{id}", lambda state: ("DELETE", f"/projects/{state['created'].pop()}", {})),
+        ("DELETE /projects/bulk", lambda state: (
+            "DELETE", "/projects/bulk",
+            {"json": {"ids": [state["bulk_created"].pop() for _ in range(BULK_SIZE)]}})),
+    ]
+
+
+def record_created(state, name, response):
+    # Remember created IDs so the delete scenarios have projects to remove
+    if name == "POST /projects/":
+        state["created"].append(response.json()["project"]["id"])
+    elif name == "POST /projects/bulk":
+        state["bulk_created"].extend(result["id"] for result in response.json()["results"] if "id" in result)
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def percentile(latencies, percent):
+    return statistics.quantiles(latencies, n=100)[percent - 1] if len(latencies) > 1 else latencies[0]
+
+
+async def run_scenario(client, name, make_request, state, requests, concurrency, trace_memory):
+    latencies = []
+    failures = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal failures
+        for _ in remaining:
+            method, url, kwargs = make_request(state)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except Exception:
+                # e.g. an error raised while a streamed response was being sent
+                response = None
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response is None or response.status_code >= 400:
+                failures += 1
+            else:
+                record_created(state, name, response)
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    result = {
+        "scenario": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "failed": failures,
+        "rss_mb": round(rss_mb(), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    if trace_memory:
+        result["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        tracemalloc.stop()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, cold_start, baseline_path, max_regression):
+    """Print the change against a baseline file; return the scenarios that regressed too much."""
+
+    with open(baseline_path) as baseline_file:
+        baseline_report = json.load(baseline_file)
+    baseline = {result["scenario"]: result for result in baseline_report["results"]}
+    print(f"\nagainst {baseline_path}")
+    print(f"{'scenario':>30} {'req/s change':>13} {'p95 change':>11}")
+    regressions = []
+    for result in results:
+        before = baseline.get(result["scenario"])
+        if before is None:
+            continue
+        throughput = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100
+        p95 = (result["p95_ms"] / before["p95_ms"] - 1) * 100
+        print(f"{result['scenario']:>30} {throughput:>+12.1f}% {p95:>+10.1f}%")
+        if max_regression is not None and (throughput < -max_regression or p95 > max_regression):
+            regressions.append(result["scenario"])
+    before = baseline_report.get("cold_start")
+    if cold_start and before:
+        first_response = (cold_start["first_response_ms"] / before["first_response_ms"] - 1) * 100
+        print(f"{'time to first response':>30} {'':>13} {first_response:>+10.1f}%")
+        if max_regression is not None and first_response > max_regression:
+            regressions.append("cold start")
+    return regressions
+
+
+async def main(args):
+    random.seed(args.seed)
+    results = []
+    async with temp_database(rows=args.rows) as session_factory, \
+            read_only_sessions(session_factory) as read_session_factory:
+        override_databases(app, session_factory, read_session_factory)
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        state = {"created": [], "bulk_created": []}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"{'scenario':>30} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7} "
+                  f"{'rss MB':>7}")
+            for name, make_request in build_scenarios(args.rows):
+                if args.only and not any(pattern in name for pattern in args.only):
+                    continue
+                result = await run_scenario(client, name, make_request, state, args.requests,
+                                            args.concurrency, args.trace_memory)
+                results.append(result)
+                print(f"{name:>30} {result['throughput_rps']:>9.1f} {result['p50_ms']:>8.2f} "
+                      f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['failed']:>7} "
+                      f"{result['rss_mb']:>7.1f}")
+        app.dependency_overrides.clear()
+
+    cold_start = None
+    if args.cold_starts:
+        cold_start = measure_cold_start(runs=args.cold_starts)
+        print(f"\ncold start: import {cold_start['import_ms']:.0f} ms, startup {cold_start['startup_ms']:.0f} ms, "
+              f"first response {cold_start['first_response_ms']:.0f} ms after process start")
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "rows": args.rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "results": results,
+        "cold_start": cold_start,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.baseline:
+        regressions = compare(results, cold_start, args.baseline, args.max_regression)
+        if regressions:
+            print(f"\nregressed by more than {args.max_regression}%: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", nargs="+", help="run only scenarios whose name contains one of these")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--cold-starts", type=int, default=5, help="fresh interpreters to time; 0 skips it")
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--max-regression", type=float)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,50 @@
+"""Bulk write benchmark.
+
+Inserts the same set of projects twice into a throwaway SQLite database:
+once through ``create_project_service`` (one commit per project) and once
+through ``bulk_create_projects_service`` (batched inserts, single commit),
+then reports rows/sec for both.
+
+Usage:
+    python benchmarks/bench_bulk.py --rows 5000 --batch-size 500
+"""
+import argparse
+import asyncio
+import time
+
+from _common import temp_database, project_rows
+from schemas import ProjectCreate
+from services import create_project_service, bulk_create_projects_service
+
+
+async def per_item(session_factory, projects):
+    async with session_factory() as db:
+        for project in projects:
+            await create_project_service(db=db, project=project)
+
+
+async def bulk(session_factory, projects, batch_size):
+    async with session_factory() as db:
+        await bulk_create_projects_service(db=db, projects=projects, batch_size=batch_size)
+
+
+async def main(args):
+    projects = [ProjectCreate(**row) for row in project_rows(args.rows)]
+    runs = [
+        ("per-item", lambda factory: per_item(factory, projects)),
+        (f"bulk (batch={args.batch_size})", lambda factory: bulk(factory, projects, args.batch_size)),
+    ]
+    print(f"{'mode':>22} {'seconds':>10} {'rows/s':>12}")
+    for name, run in runs:
+        async with temp_database() as session_factory:
+            started = time.perf_counter()
+            await run(session_factory)
+            elapsed = time.perf_counter() - started
+        print(f"{name:>22} {elapsed:>10.3f} {args.rows / elapsed:>12.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
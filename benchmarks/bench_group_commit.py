@@ -0,0 +1,86 @@
+"""Create throughput benchmark: commit per request vs. group commit.
+
+Runs ``--clients`` concurrent writers, each creating ``--creates`` projects on
+a throwaway SQLite database, once through ``create_project_service`` with its
+own commit per call and once through a ``GroupCommitter`` that shares commits
+between concurrent calls. Reports creates/sec, p50/p95 latency per successful
+create and the number of failed creates.
+
+The fsync cost a shared commit saves depends on the SQLite profile; compare
+``--profile production`` (WAL, synchronous=NORMAL) with ``--profile safe``
+(rollback journal, fsync on every commit).
+
+Usage:
+    python benchmarks/bench_group_commit.py --clients 64 --creates 50 --profile safe
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+
+from fastapi import HTTPException
+
+from _common import temp_database
+from database import SQLITE_PROFILES
+from group_commit import GroupCommitter
+from schemas import ProjectCreate
+from services import create_project_service
+
+PROJECT = ProjectCreate(project_name="Benchmark project", project_description="Benchmark project",
+                        project_start_date=date(2024, 1, 1), project_end_date=date(2024, 12, 31))
+
+
+async def run_clients(clients, creates, create):
+    latencies = []
+    failures = 0
+
+    async def client():
+        nonlocal failures
+        for _ in range(creates):
+            started = time.perf_counter()
+            try:
+                await create()
+            except HTTPException:
+                # e.g. "database is locked" once writers outlast busy_timeout
+                failures += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    quantiles = statistics.quantiles(latencies, n=20)
+    return len(latencies) / elapsed, statistics.median(latencies), quantiles[18], failures
+
+
+async def main(args):
+    profile = SQLITE_PROFILES[args.profile]
+    print(f"{'mode':>32} {'creates/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'failed':>7}")
+
+    async with temp_database(profile=profile) as session_factory:
+        async def per_request():
+            async with session_factory() as db:
+                await create_project_service(db=db, project=PROJECT)
+
+        result = await run_clients(args.clients, args.creates, per_request)
+        print(f"{'commit per request':>32} {result[0]:>10.0f} {result[1]:>8.2f} {result[2]:>8.2f} {result[3]:>7}")
+
+    for max_delay_ms in args.max_delay_ms:
+        async with temp_database(profile=profile) as session_factory:
+            committer = GroupCommitter(session_factory, max_batch=args.max_batch, max_delay=max_delay_ms / 1000)
+            result = await run_clients(args.clients, args.creates,
+                                       lambda: committer.create(PROJECT.model_dump()))
+            await committer.close()
+            name = f"group commit ({max_delay_ms:g} ms window)"
+            print(f"{name:>32} {result[0]:>10.0f} {result[1]:>8.2f} {result[2]:>8.2f} {result[3]:>7}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--creates", type=int, default=50)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, nargs="+", default=[0, 2, 10])
+    parser.add_argument("--profile", choices=SQLITE_PROFILES, default="production")
+    asyncio.run(main(parser.parse_args()))
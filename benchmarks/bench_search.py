@@ -0,0 +1,93 @@
+"""Search benchmark: FTS5 index vs. LIKE scan.
+
+Seeds a throwaway SQLite database with projects whose names and descriptions
+are drawn from a large synthetic vocabulary, then times the same searches two ways:
+
+* LIKE: ``project_name LIKE '%term%' OR project_description LIKE '%term%'``
+  for every term, a full table scan;
+* FTS5: ``search_projects_service``, prefix match on the FTS5 index ranked
+  by BM25.
+
+Both return ``--limit`` matches; reports mean latency per query. LIKE stops at
+the first unranked hits, so for a short prefix that matches most of the table
+(e.g. three letters) it wins: FTS5 still ranks up to SEARCH_RANK_CANDIDATES
+matches.
+
+Usage:
+    python benchmarks/bench_search.py --rows 1000000 --repeat 5
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date
+
+from sqlalchemy import select, insert, and_, or_
+
+from _common import temp_database
+from models import ProjectManagementSystem
+from services import PROJECT_COLUMNS, search_projects_service
+
+# A vocabulary large enough that, like real project text, most words are selective
+SYLLABLES = "ka lo mi nu re sa ti vo ze bra cle dro fen gli hum jor".split()
+WORDS = sorted({"".join(random.Random(i).choices(SYLLABLES, k=4)) for i in range(20000)})
+QUERIES = [WORDS[100], WORDS[2000][:4], f"{WORDS[10]} {WORDS[20]}", WORDS[3000][:3], WORDS[-1]]
+SEED_BATCH_SIZE = 50000
+
+
+def search_rows(count, start=1):
+    rng = random.Random(start)
+    return [
+        {
+            "project_name": " ".join(rng.sample(WORDS, 3)) + f" {i}",
+            "project_description": " ".join(rng.sample(WORDS, 12)),
+            "project_start_date": date(2024, 1, 1),
+            "project_end_date": date(2024, 12, 31),
+        }
+        for i in range(start, start + count)
+    ]
+
+
+async def like_search(db, q, limit):
+    columns = (ProjectManagementSystem.project_name, ProjectManagementSystem.project_description)
+    condition = and_(*(or_(*(column.like(f"%{term}%") for column in columns)) for term in q.split()))
+    result = await db.execute(
+        select(*PROJECT_COLUMNS).where(condition).order_by(ProjectManagementSystem.id).limit(limit)
+    )
+    return result.mappings().all()
+
+
+async def fts_search(db, q, limit):
+    return await search_projects_service(db=db, q=q, limit=limit)
+
+
+async def main(args):
+    async with temp_database() as session_factory:
+        started = time.perf_counter()
+        async with session_factory() as db:
+            for start in range(1, args.rows + 1, SEED_BATCH_SIZE):
+                count = min(SEED_BATCH_SIZE, args.rows + 1 - start)
+                await db.execute(insert(ProjectManagementSystem), search_rows(count, start))
+            await db.commit()
+        print(f"seeded {args.rows} rows (with FTS triggers) in {time.perf_counter() - started:.1f}s\n")
+
+        print(f"{'query':>30} {'LIKE ms':>10} {'FTS5 ms':>10} {'speedup':>8}")
+        for q in QUERIES:
+            timings = {}
+            for name, search in (("like", like_search), ("fts", fts_search)):
+                async with session_factory() as db:
+                    await search(db, q, args.limit)  # warm up
+                    started = time.perf_counter()
+                    for _ in range(args.repeat):
+                        await search(db, q, args.limit)
+                    timings[name] = (time.perf_counter() - started) / args.repeat * 1000
+            print(f"{q:>30} {timings['like']:>10.2f} {timings['fts']:>10.2f} "
+                  f"{timings['like'] / timings['fts']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
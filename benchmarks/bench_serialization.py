@@ -0,0 +1,74 @@
+"""List serialization microbenchmark.
+
+Fetches the same page of projects from a throwaway SQLite database and
+renders it to JSON bytes two ways:
+
+* before: ORM instances, ``to_dict()``, ``jsonable_encoder`` and
+  ``JSONResponse`` (what ``response_model=dict`` routes did);
+* after: row mappings rendered by ``FastJSONResponse``.
+
+Reports rows/sec for fetch + render and for render alone.
+
+Usage:
+    python benchmarks/bench_serialization.py --rows 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+from _common import temp_database
+from fast_json import FastJSONResponse
+from models import ProjectManagementSystem
+from services import PROJECT_COLUMNS
+
+
+async def fetch_orm(db):
+    result = await db.execute(select(ProjectManagementSystem).order_by(ProjectManagementSystem.id))
+    return result.scalars().all()
+
+
+def render_orm(projects):
+    content = {"message": "Successfully fetched the list of projects.",
+               "projects": [project.to_dict() for project in projects]}
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+async def fetch_rows(db):
+    result = await db.execute(select(*PROJECT_COLUMNS).order_by(ProjectManagementSystem.id))
+    return result.mappings().all()
+
+
+def render_rows(projects):
+    content = {"message": "Successfully fetched the list of projects.",
+               "projects": [dict(project) for project in projects]}
+    return FastJSONResponse(content).body
+
+
+async def main(args):
+    runs = [("before (ORM + to_dict)", fetch_orm, render_orm), ("after (rows + orjson)", fetch_rows, render_rows)]
+    print(f"{'path':>24} {'fetch+render rows/s':>20} {'render rows/s':>15}")
+    async with temp_database(rows=args.rows) as session_factory:
+        for name, fetch, render in runs:
+            total = render_only = 0.0
+            for _ in range(args.repeat):
+                async with session_factory() as db:
+                    started = time.perf_counter()
+                    projects = await fetch(db)
+                    fetched = time.perf_counter()
+                    render(projects)
+                    finished = time.perf_counter()
+                total += finished - started
+                render_only += finished - fetched
+            rows = args.rows * args.repeat
+            print(f"{name:>24} {rows / total:>20.0f} {rows / render_only:>15.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""Write throughput benchmark: one database vs. projects sharded over several.
+
+Runs ``--clients`` concurrent writers, each creating ``--creates`` projects
+through ``create_project_service`` with a commit per call, against throwaway
+SQLite databases split into each of ``--shards`` shards. Creates go to the
+shards in turn, as with ``get_async_db``. Reports creates/sec, p50/p95
+latency per successful create and the number of failed creates.
+
+Every shard has its own write lock and its own journal, so writers on
+different shards commit in parallel; a single database serialises them. The
+gain is largest when commits wait on the disk: compare ``--profile safe``
+(rollback journal, fsync on every commit) with ``--profile production``
+(WAL, synchronous=NORMAL), where a commit is mostly CPU and one core shows
+little difference.
+
+Usage:
+    python benchmarks/bench_shards.py --shards 1 2 4 --clients 64 --creates 50 --profile safe
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+from contextlib import asynccontextmanager
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from _common import seed
+from bench_group_commit import PROJECT, run_clients
+from database import SQLITE_PROFILES, Shard, configure_sqlite_engine
+from models import claim_shard
+from services import create_project_service
+
+
+@asynccontextmanager
+async def sharded_databases(count, pool_size, profile):
+    """Yield one async session factory per shard of ``count`` freshly created shard databases."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engines = []
+        for index in range(count):
+            db_path = os.path.join(tmp, f"shard-{index}.db")
+            seed(db_path, 0)
+            schema_engine = create_engine(f"sqlite:///{db_path}")
+            with schema_engine.begin() as connection:
+                claim_shard(connection, Shard(index, f"sqlite:///{db_path}"))
+            schema_engine.dispose()
+            engines.append(configure_sqlite_engine(
+                create_async_engine(f"sqlite+aiosqlite:///{db_path}", pool_size=pool_size, max_overflow=0),
+                profile,
+            ))
+        try:
+            yield [async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False) for engine in engines]
+        finally:
+            for engine in engines:
+                await engine.dispose()
+
+
+async def main(args):
+    profile = SQLITE_PROFILES[args.profile]
+    print(f"{'shards':>8} {'creates/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'failed':>7} {'speedup':>8}")
+    baseline = None
+    for count in args.shards:
+        async with sharded_databases(count, max(1, args.clients // count), profile) as session_factories:
+            next_shard = itertools.cycle(session_factories)
+
+            async def create():
+                async with next(next_shard)() as db:
+                    await create_project_service(db=db, project=PROJECT)
+
+            result = await run_clients(args.clients, args.creates, create)
+        baseline = baseline or result[0]
+        print(f"{count:>8} {result[0]:>10.0f} {result[1]:>8.2f} {result[2]:>8.2f} {result[3]:>7} "
+              f"{result[0] / baseline:>7.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--creates", type=int, default=50)
+    parser.add_argument("--profile", choices=SQLITE_PROFILES, default="safe")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,47 @@
+"""SQLite profile benchmark.
+
+Runs the same burst of concurrent project creations against a throwaway
+database once per profile in ``database.SQLITE_PROFILES`` and reports write
+throughput and how many writes failed (e.g. with "database is locked").
+
+Usage:
+    python benchmarks/bench_sqlite_profile.py --writers 32 --writes 50
+"""
+import argparse
+import asyncio
+import time
+
+from _common import temp_database, project_rows
+from database import SQLITE_PROFILES
+from schemas import ProjectCreate
+from services import create_project_service
+
+
+async def writer(session_factory, projects, failures):
+    async with session_factory() as db:
+        for project in projects:
+            try:
+                await create_project_service(db=db, project=project)
+            except Exception:
+                failures.append(project)
+                await db.rollback()
+
+
+async def main(args):
+    projects = [ProjectCreate(**row) for row in project_rows(args.writes)]
+    print(f"{'profile':>12} {'writes/s':>10} {'failed':>8}")
+    for name, profile in SQLITE_PROFILES.items():
+        failures = []
+        async with temp_database(pool_size=args.writers, profile=profile) as session_factory:
+            started = time.perf_counter()
+            await asyncio.gather(*(writer(session_factory, projects, failures) for _ in range(args.writers)))
+            elapsed = time.perf_counter() - started
+        total = args.writers * args.writes
+        print(f"{name:>12} {(total - len(failures)) / elapsed:>10.1f} {len(failures):>8}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
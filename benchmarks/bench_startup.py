@@ -0,0 +1,121 @@
+"""Cold start benchmark: import time and time to first response.
+
+Starts ``--runs`` fresh interpreters against a throwaway SQLite database with
+``--rows`` projects. Each one imports ``main_app``, runs its startup
+(lifespan) and serves ``GET /projects/{id}`` through the in-process ASGI
+transport. Reports, from process start, when the import finished, when
+startup finished and when the first response arrived (median and max over
+the runs).
+
+``--imports`` also prints the slowest direct imports of ``main_app`` as
+measured by ``python -X importtime``.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 10 --imports 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STEPS = ("import_ms", "startup_ms", "first_response_ms")
+
+
+async def probe():
+    """Run in the child: time the import, the startup and the first request of the app."""
+
+    started = float(os.environ["BENCH_SPAWNED_AT"])
+    timings = {}
+
+    def mark(step):
+        timings[step] = round((time.time() - started) * 1000, 1)
+
+    sys.path.insert(0, ROOT)
+    from main_app import app
+    mark("import_ms")
+
+    import httpx
+    async with app.router.lifespan_context(app):
+        mark("startup_ms")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            response = await client.get("/projects/1")
+            response.raise_for_status()
+        mark("first_response_ms")
+    print(json.dumps(timings))
+
+
+def cold_start(env, cwd):
+    env = {**env, "BENCH_SPAWNED_AT": repr(time.time())}
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--probe"], env=env, cwd=cwd,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env, cwd, count):
+    """Return ``(module, cumulative ms)`` for the ``count`` slowest direct imports of ``main_app``."""
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main_app"],
+                            env={**env, "PYTHONPATH": ROOT}, cwd=cwd, capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented module name>", children before their parent
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == "main_app":
+            imports.append(("main_app (total)", int(cumulative) / 1000))
+            break
+        if not name.startswith("  "):
+            # Another top-level import (e.g. from site); its children aren't main_app's
+            imports = []
+        elif not name.startswith("    "):
+            imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:count]
+
+
+def measure_cold_start(runs=5, rows=1000):
+    """Cold start several fresh interpreters and return the median and max of every step."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seed(os.path.join(tmp, "bench.db"), rows)
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+               "ARCHIVE_INTERVAL_SECONDS": "0"}
+        samples = [cold_start(env, tmp) for _ in range(runs)]
+    return {
+        **{step: round(statistics.median(sample[step] for sample in samples), 1) for step in STEPS},
+        **{f"max_{step}": max(sample[step] for sample in samples) for step in STEPS},
+        "runs": runs,
+    }
+
+
+def main(args):
+    result = measure_cold_start(args.runs, args.rows)
+    print(f"{'step':>18} {'median ms':>10} {'max ms':>8}")
+    for step in STEPS:
+        print(f"{step[:-3]:>18} {result[step]:>10.1f} {result['max_' + step]:>8.1f}")
+    if args.imports:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"\n{'import':>40} {'cumulative ms':>14}")
+            for name, cumulative in slowest_imports(os.environ, tmp, args.imports):
+                print(f"{name:>40} {cumulative:>14.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--imports", type=int, default=0, help="print this many of the slowest imports")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.probe:
+        asyncio.run(probe())
+    else:
+        main(args)
@@ -0,0 +1,109 @@
+"""Timeline benchmark: R*Tree interval index vs. date-column scan.
+
+Grows one throwaway SQLite database through each of ``--sizes`` and, at every
+size, times the same overlap queries two ways:
+
+* scan: ``project_start_date <= :to AND project_end_date >= :from`` on the
+  unindexed date columns, in id order;
+* R*Tree: ``get_timeline_service``, candidates from ``projects_timeline``.
+
+Projects start on a random day between 2000 and 2029 and run for 1 to 60
+days; a small share have no start or no end date. Queries return at most
+``--limit`` rows; reports mean latency per query and the rows returned.
+
+The scan stops once it has ``--limit`` matches, so on dense dates it only
+reads part of the table; on sparse dates (``on 1999-06-01``, where only the
+open-ended projects match) it reads all of it. The R*Tree cost follows the
+number of overlapping projects, not the table size.
+
+Usage:
+    python benchmarks/bench_timeline.py --sizes 10000 100000 1000000 --repeat 20
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import select, insert, or_
+
+from _common import temp_database
+from models import ProjectManagementSystem
+from services import LIVE, PROJECT_COLUMNS, get_timeline_service
+
+QUERIES = (
+    ("on 2015-06-15", date(2015, 6, 15), date(2015, 6, 15)),
+    ("2015-06-01..2015-06-30", date(2015, 6, 1), date(2015, 6, 30)),
+    ("2015 (whole year)", date(2015, 1, 1), date(2015, 12, 31)),
+    ("on 1999-06-01", date(1999, 6, 1), date(1999, 6, 1)),
+)
+SEED_BATCH_SIZE = 50000
+FIRST_DAY = date(2000, 1, 1)
+DAYS = (date(2030, 1, 1) - FIRST_DAY).days
+
+
+def timeline_rows(count, start=1):
+    rng = random.Random(start)
+    rows = []
+    for i in range(start, start + count):
+        starts = FIRST_DAY + timedelta(days=rng.randrange(DAYS))
+        ends = starts + timedelta(days=rng.randrange(60))
+        # About 0.1% open-ended on either side
+        open_side = rng.random()
+        rows.append({
+            "project_name": f"Project {i}",
+            "project_description": "Timeline benchmark project",
+            "project_start_date": None if open_side < 0.0005 else starts,
+            "project_end_date": None if 0.0005 <= open_side < 0.001 else ends,
+        })
+    return rows
+
+
+async def scan_timeline(db, start, end, limit):
+    columns = ProjectManagementSystem
+    result = await db.execute(
+        select(*PROJECT_COLUMNS)
+        .where(or_(columns.project_start_date.is_(None), columns.project_start_date <= end),
+               or_(columns.project_end_date.is_(None), columns.project_end_date >= start), LIVE)
+        .order_by(columns.id)
+        .limit(limit)
+    )
+    return result.mappings().all()
+
+
+async def indexed_timeline(db, start, end, limit):
+    return await get_timeline_service(db=db, start=start, end=end, limit=limit)
+
+
+async def main(args):
+    async with temp_database() as session_factory:
+        rows = 0
+        for size in sorted(args.sizes):
+            started = time.perf_counter()
+            async with session_factory() as db:
+                while rows < size:
+                    count = min(SEED_BATCH_SIZE, size - rows)
+                    await db.execute(insert(ProjectManagementSystem), timeline_rows(count, rows + 1))
+                    rows += count
+                await db.commit()
+            print(f"\n{size} rows (seeded with triggers in {time.perf_counter() - started:.1f}s)")
+            print(f"{'query':>24} {'rows':>6} {'scan ms':>10} {'R*Tree ms':>10} {'speedup':>8}")
+            for label, start, end in QUERIES:
+                timings = {}
+                for name, timeline in (("scan", scan_timeline), ("rtree", indexed_timeline)):
+                    async with session_factory() as db:
+                        found = len(await timeline(db, start, end, args.limit))  # warm up
+                        started = time.perf_counter()
+                        for _ in range(args.repeat):
+                            await timeline(db, start, end, args.limit)
+                        timings[name] = (time.perf_counter() - started) / args.repeat * 1000
+                print(f"{label:>24} {found:>6} {timings['scan']:>10.2f} {timings['rtree']:>10.2f} "
+                      f"{timings['scan'] / timings['rtree']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""Worker scaling benchmark for serve.py.
+
+Seeds a throwaway SQLite database, then for each worker count starts
+``serve.py --workers N`` on a local port and loads ``GET /projects/{id}``
+over HTTP from ``--client-processes`` load generator processes, each keeping
+``--concurrency`` requests in flight for ``--duration`` seconds. Reports
+requests/sec and p95 latency per worker count, then stops the server with
+SIGTERM (graceful drain).
+
+Requests/sec can only scale up to the number of CPU cores, which are shared
+with the load generators; on a single core extra workers only add overhead.
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from _common import seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+async def generate_load(port, rows, concurrency, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(f"/projects/{random.randint(1, rows)}")
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def load_process(arguments):
+    return asyncio.run(generate_load(*arguments))
+
+
+def run_level(workers, args, env):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "serve.py"), "--workers", str(workers), "--host", "127.0.0.1",
+         "--port", str(args.port)],
+        cwd=env["BENCH_DIR"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(args.port)
+        time.sleep(1)  # let every worker finish starting
+        with multiprocessing.Pool(args.client_processes) as pool:
+            started = time.perf_counter()
+            results = pool.map(load_process, [(args.port, args.rows, args.concurrency, args.duration)]
+                               * args.client_processes)
+            elapsed = time.perf_counter() - started
+        latencies = [latency for result in results for latency in result]
+        return len(latencies) / elapsed, statistics.quantiles(latencies, n=20)[18]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed(db_path, args.rows)
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "BENCH_DIR": tmp,
+               "ARCHIVE_INTERVAL_SECONDS": "0"}
+        print(f"{os.cpu_count()} CPU cores, {args.client_processes} load generator processes")
+        print(f"{'workers':>8} {'req/s':>10} {'p95 ms':>8}")
+        for workers in args.workers:
+            throughput, p95 = run_level(workers, args, env)
+            print(f"{workers:>8} {throughput:>10.1f} {p95:>8.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight per load generator")
+    parser.add_argument("--client-processes", type=int, default=max((os.cpu_count() or 2) // 2, 1))
+    parser.add_argument("--port", type=int, default=8199)
+    main(parser.parse_args())
@@ -0,0 +1,66 @@
+"""Per-write latency benchmark for update and delete.
+
+Compares the services against the previous ORM flow (SELECT, mutate, commit,
+refresh for updates; SELECT then ORM delete for deletes) on a throwaway
+SQLite database and reports mean and p95 latency per write.
+
+Usage:
+    python benchmarks/bench_writes.py --rows 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import select
+
+from _common import temp_database
+from models import ProjectManagementSystem
+from schemas import ProjectUpdate
+from services import update_project_service, delete_project_service
+
+
+async def orm_update(db, project_id, project):
+    result = await db.execute(select(ProjectManagementSystem).where(ProjectManagementSystem.id == project_id))
+    db_project = result.scalars().first()
+    db_project.project_name = project.project_name
+    await db.commit()
+    await db.refresh(db_project)
+
+
+async def orm_delete(db, project_id):
+    result = await db.execute(select(ProjectManagementSystem).where(ProjectManagementSystem.id == project_id))
+    await db.delete(result.scalars().first())
+    await db.commit()
+
+
+async def measure(session_factory, rows, operation):
+    latencies = []
+    async with session_factory() as db:
+        for project_id in range(1, rows + 1):
+            started = time.perf_counter()
+            await operation(db, project_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.mean(latencies), statistics.quantiles(latencies, n=20)[18]
+
+
+async def main(args):
+    project = ProjectUpdate(project_name="Renamed project")
+    runs = [
+        ("update (ORM)", lambda db, project_id: orm_update(db, project_id, project)),
+        ("update (RETURNING)", lambda db, project_id: update_project_service(db=db, project_id=project_id,
+                                                                             project=project)),
+        ("delete (ORM)", orm_delete),
+        ("delete (RETURNING)", lambda db, project_id: delete_project_service(db=db, project_id=project_id)),
+    ]
+    print(f"{'operation':>20} {'mean ms':>10} {'p95 ms':>10}")
+    for name, operation in runs:
+        async with temp_database(rows=args.rows) as session_factory:
+            mean, p95 = await measure(session_factory, args.rows, operation)
+        print(f"{name:>20} {mean:>10.3f} {p95:>10.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+from fast_json import dumps, loads
+from models import ProjectManagementSystem
+
+# Project columns that JSON carries as ISO strings, with the type SharedCache parses them back into
+TEMPORAL_COLUMNS = {
+    column.name: column.type.python_type for column in ProjectManagementSystem.__table__.columns
+    if column.type.python_type in (date, datetime)
+}
+
+
+class LRUCache:
+    """In-process cache bounded by entry count, with an optional per-entry TTL.
+
+    Every invalidation bumps a generation counter. A reader captures the generation before
+    loading from the database and passes it to ``set``; if a write invalidated the cache in
+    between, the fill is dropped so a stale row can never be cached after its invalidation.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    async def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    async def set(self, key, value, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            expires_at = time.monotonic() + self.ttl if self.ttl else None
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def delete(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += len(keys)
+
+    async def generation(self) -> int:
+        return self._generation
+
+    async def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class LocalSharedClient:
+    """In-memory stand-in for a Redis-style async client (``get``/``set``/``delete``/``incr``).
+
+    Lets the shared backend run in development and tests without a Redis server.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key):
+        value, expires_at = self._data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key):
+        with self._lock:
+            return self._alive(key)
+
+    async def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+
+    async def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def incr(self, key):
+        with self._lock:
+            value = int(self._alive(key) or 0) + 1
+            self._data[key] = (str(value).encode(), None)
+            return value
+
+    async def flushdb(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SharedCache:
+    """Cache stored in a shared Redis-style backend, so all workers see the same entries.
+
+    Size bounds and eviction are left to the backend (e.g. Redis ``maxmemory``); entries
+    expire after ``ttl`` seconds. The generation counter lives in the backend as well, so an
+    invalidation in one worker also discards in-flight fills in the others. ``clear`` flushes
+    the whole backend database, so point it at a database dedicated to this cache. Entries are
+    project rows stored as JSON, never pickles, so a compromised backend can't run code in the app.
+    """
+
+    def __init__(self, client, ttl: float = 60.0, prefix: str = "projects"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    async def get(self, key):
+        payload = await self.client.get(self._key(key))
+        if payload is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        row = loads(payload)
+        for name, kind in TEMPORAL_COLUMNS.items():
+            if row.get(name) is not None:
+                row[name] = kind.fromisoformat(row[name])
+        return row
+
+    async def set(self, key, value, generation: int):
+        if generation != await self.generation():
+            return
+        await self.client.set(self._key(key), dumps(value), ex=int(self.ttl) or None)
+        # An invalidation can land between the check and the write. It bumps the generation before
+        # deleting, so either its delete comes after our write or we see the new generation here
+        if generation != await self.generation():
+            await self.client.delete(self._key(key))
+
+    async def delete(self, *keys):
+        await self.client.incr(self._key("generation"))
+        if keys:
+            await self.client.delete(*(self._key(key) for key in keys))
+        self.invalidations += len(keys)
+
+    async def generation(self) -> int:
+        return int(await self.client.get(self._key("generation")) or 0)
+
+    async def clear(self):
+        await self.client.flushdb()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "shared",
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": self.invalidations,
+        }
+
+
+class NullCache:
+    """Cache that stores nothing; every lookup goes to the database."""
+
+    async def get(self, key):
+        return None
+
+    async def set(self, key, value, generation: int):
+        return None
+
+    async def delete(self, *keys):
+        return None
+
+    async def generation(self) -> int:
+        return 0
+
+    async def clear(self):
+        return None
+
+    def stats(self) -> dict:
+        return {"backend": "none"}
+
+
+def create_cache():
+    """Build the project cache from the ``PROJECT_CACHE_*`` environment variables.
+
+    ``PROJECT_CACHE_BACKEND`` is ``memory`` (default), ``shared`` or ``none``. The shared backend
+    connects to ``PROJECT_CACHE_URL`` with ``redis.asyncio`` and falls back to the in-memory
+    stand-in when no URL is set.
+    """
+
+    backend = os.getenv("PROJECT_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("PROJECT_CACHE_TTL", "60"))
+    if backend == "none":
+        return NullCache()
+    if backend == "shared":
+        url = os.getenv("PROJECT_CACHE_URL")
+        if url:
+            import redis.asyncio as redis
+            client = redis.Redis.from_url(url)
+        else:
+            client = LocalSharedClient()
+        return SharedCache(client, ttl=ttl)
+    return LRUCache(max_size=int(os.getenv("PROJECT_CACHE_MAX_SIZE", "1024")), ttl=ttl)
+
+
+project_cache = create_cache()
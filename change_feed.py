@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from contextlib import suppress
+from typing import List
+
+from database import AsyncReadSessionLocal, SHARD_ID_BITS, shards
+from services import PROJECT_COLUMNS, get_changes_service, get_latest_change_seq_service
+
+logger = logging.getLogger(__name__)
+
+# Recent events kept in memory; subscribers further behind catch up from the database
+CHANGE_FEED_BUFFER_SIZE = int(os.getenv("CHANGE_FEED_BUFFER_SIZE", "1000"))
+CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL_MS", "250")) / 1000
+# Idle subscribers get an empty batch this often (an SSE keep-alive comment)
+CHANGE_FEED_HEARTBEAT = float(os.getenv("CHANGE_FEED_HEARTBEAT_SECONDS", "15"))
+
+PROJECT_COLUMN_NAMES = tuple(column.name for column in PROJECT_COLUMNS)
+
+
+def change_event(row) -> dict:
+    """Turn a ``get_changes_service`` row into an event; ``project`` is None once it is deleted."""
+
+    return {
+        "seq": row["seq"],
+        "operation": row["operation"],
+        "project_id": row["project_id"],
+        "changed_at": row["changed_at"],
+        "project": {name: row[name] for name in PROJECT_COLUMN_NAMES} if row["id"] is not None else None,
+    }
+
+
+class ChangeFeed:
+    """Fan the project change log out to any number of subscribers.
+
+    While anyone is subscribed, one poller task reads new change-log entries every ``poll_interval``
+    seconds and appends them to a buffer of the last ``buffer_size`` events, which every subscriber
+    reads from. The database cost is one query per poll however many subscribers there are; only a
+    subscriber resuming from further back than the buffer reaches, or still waiting on the first poll
+    when its heartbeat is due, reads the log itself.
+    """
+
+    def __init__(self, session_factory=AsyncReadSessionLocal, buffer_size: int = CHANGE_FEED_BUFFER_SIZE,
+                 poll_interval: float = CHANGE_FEED_POLL_INTERVAL, batch_size: int = 500):
+        self.session_factory = session_factory
+        self.buffer_size = buffer_size
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.subscribers = 0
+        self._buffer = deque()
+        # Every event with seq > _floor, up to _last_seq, is in the buffer
+        self._floor = self._last_seq = None
+        self._ready = None
+        self._changed = None
+        self._poller = None
+        self._loop = None
+
+    async def latest_seq(self) -> int:
+        """Sequence number of the newest change, i.e. where a new subscriber starts."""
+
+        if self._last_seq is not None and self._loop is asyncio.get_running_loop():
+            return self._last_seq
+        async with self.session_factory() as db:
+            return await get_latest_change_seq_service(db)
+
+    async def subscribe(self, after: int, heartbeat: float = CHANGE_FEED_HEARTBEAT):
+        """Yield lists of events with ``seq > after`` in order, or an empty list after ``heartbeat`` idle seconds."""
+
+        self._start()
+        self.subscribers += 1
+        try:
+            position = after
+            while not self._ready.is_set():
+                try:
+                    await asyncio.wait_for(self._ready.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    # Nothing is buffered before the first poll; a subscriber behind on the log gets its
+                    # backlog from the database rather than an empty batch
+                    events = await self._read_after(position)
+                    if events:
+                        position = events[-1]["seq"]
+                    yield events
+            while True:
+                # Taken before reading, so a batch polled meanwhile still wakes us below
+                changed = self._changed
+                events = await self._read_after(position)
+                if events:
+                    position = events[-1]["seq"]
+                    yield events
+                    continue
+                try:
+                    await asyncio.wait_for(changed.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield []
+        finally:
+            self.subscribers -= 1
+            if not self.subscribers:
+                self._stop()
+
+    async def _read_after(self, position: int):
+        if self._floor is not None and position >= self._floor:
+            return [event for event in self._buffer if event["seq"] > position][:self.batch_size]
+        # Too far behind for the buffer
+        async with self.session_factory() as db:
+            rows = await get_changes_service(db, after=position, limit=self.batch_size)
+        return [change_event(row) for row in rows]
+
+    def _start(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and not self._poller.done():
+            return
+        # The poller belongs to the event loop it was started on
+        self._loop = loop
+        self._buffer.clear()
+        self._floor = self._last_seq = None
+        self._ready = asyncio.Event()
+        self._changed = asyncio.Event()
+        self._poller = loop.create_task(self._poll())
+
+    def _stop(self):
+        self._poller.cancel()
+        self._floor = self._last_seq = None
+        self._loop = None
+
+    async def _poll(self):
+        while True:
+            try:
+                async with self.session_factory() as db:
+                    if self._last_seq is None:
+                        self._floor = self._last_seq = await get_latest_change_seq_service(db)
+                        self._ready.set()
+                    rows = await get_changes_service(db, after=self._last_seq, limit=self.batch_size)
+            except Exception as e:
+                # Subscribers keep getting heartbeats; the next poll retries
+                logger.error(f"Error polling the change log: {str(e)}")
+                rows = []
+            if rows:
+                self._append([change_event(row) for row in rows])
+            if len(rows) < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def _append(self, events):
+        for event in events:
+            if len(self._buffer) >= self.buffer_size:
+                self._floor = self._buffer.popleft()["seq"]
+            self._buffer.append(event)
+        self._last_seq = events[-1]["seq"]
+        # Wake every waiting subscriber, and give later waiters a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+change_feed = ChangeFeed()
+# One feed per shard, in shard order; shard 0's reads may go to a replica
+change_feeds = [change_feed, *(ChangeFeed(shard.read_sessions) for shard in shards[1:])]
+
+
+# With several shards, a position in the feed is one sequence number per shard; clients see it as
+# a cursor, the sequence numbers joined by commas. With one shard it is just the sequence number.
+
+def parse_cursor(cursor: str) -> List[int]:
+    """Turn a cursor into one position per shard; raises ValueError when it isn't a valid cursor."""
+
+    positions = [int(part) for part in cursor.split(",")]
+    if len(positions) != len(change_feeds) or min(positions) < 0:
+        raise ValueError(f"Expected {len(change_feeds)} non-negative sequence numbers.")
+    return positions
+
+
+def format_cursor(positions: List[int]) -> str:
+    return ",".join(str(position) for position in positions)
+
+
+def advance_cursor(positions: List[int], events) -> List[int]:
+    """Positions after ``events``; the shard of an event is encoded in its sequence number."""
+
+    positions = list(positions)
+    for event in events:
+        positions[min(event["seq"] >> SHARD_ID_BITS, len(positions) - 1)] = event["seq"]
+    return positions
+
+
+async def latest_positions() -> List[int]:
+    """Position of the newest change on every shard, i.e. where a new subscriber starts."""
+
+    return list(await asyncio.gather(*(feed.latest_seq() for feed in change_feeds)))
+
+
+async def subscribe_all(positions: List[int], heartbeat: float = CHANGE_FEED_HEARTBEAT):
+    """Yield lists of events after ``positions`` from every shard's feed, or an empty list while idle.
+
+    Events of one shard come in order; events of different shards are interleaved as they arrive.
+    """
+
+    if len(change_feeds) == 1:
+        async for events in change_feed.subscribe(after=positions[0], heartbeat=heartbeat):
+            yield events
+        return
+    subscriptions = [feed.subscribe(after=position, heartbeat=heartbeat)
+                     for feed, position in zip(change_feeds, positions)]
+    pending = {asyncio.ensure_future(anext(subscription)): subscription for subscription in subscriptions}
+    try:
+        while True:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            events = []
+            for task in done:
+                subscription = pending.pop(task)
+                events += task.result()
+                pending[asyncio.ensure_future(anext(subscription))] = subscription
+            # Every feed heartbeats while idle, so an empty list here is a heartbeat
+            yield events
+    finally:
+        for task in pending:
+            task.cancel()
+        for task in pending:
+            with suppress(asyncio.CancelledError, StopAsyncIteration):
+                await task
+        for subscription in subscriptions:
+            await subscription.aclose()
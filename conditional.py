@@ -0,0 +1,52 @@
+import hashlib
+import os
+from datetime import datetime
+from typing import Optional, List, Tuple
+
+# The volatile "date_time" envelope field makes otherwise identical responses differ;
+# set INCLUDE_RESPONSE_DATE_TIME=false to drop it so intermediary caches can store responses.
+INCLUDE_RESPONSE_DATE_TIME = os.getenv("INCLUDE_RESPONSE_DATE_TIME", "true").lower() == "true"
+
+
+def date_time_field() -> dict:
+    """Return the ``date_time`` envelope field, or nothing when it is disabled."""
+
+    if not INCLUDE_RESPONSE_DATE_TIME:
+        return {}
+    return {"date_time": datetime.now().isoformat()}
+
+
+def _quote(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def project_etag(project_id: int, updated_at: Optional[datetime]) -> str:
+    """Strong ETag of a single project, derived from its ID and ``updated_at``."""
+
+    return _quote(project_id, updated_at.isoformat() if updated_at else "")
+
+
+def projects_list_etag(versions: List[Tuple[int, Optional[int], Optional[datetime]]], query: str) -> str:
+    """Strong ETag of a page of projects, derived from the page's row count, newest ``updated_at``
+    and highest ID on every shard, plus the query string that selected the page."""
+
+    parts = []
+    for row_count, max_id, max_updated_at in versions:
+        parts += [row_count, max_id, max_updated_at.isoformat() if max_updated_at else ""]
+    return _quote(*parts, query)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Check an ``If-None-Match``/``If-Match`` header value against an ETag.
+
+    The header may list several tags or be ``*``; weak prefixes are ignored.
+    """
+
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
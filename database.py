@@ -1,9 +1,255 @@
-from sqlalchemy import create_engine
+import itertools
+import math
+import os
+import time
+from dataclasses import dataclass, replace
+
+from sqlalchemy import create_engine, event
+from starlette.requests import Request
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./project-management-system.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from metrics import db_pool_connections, instrument_engine, pool_state
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./project-management-system.db")
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL", SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+# Reads can be spread over replicas of the primary (comma-separated); by default they use the primary
+ASYNC_SQLALCHEMY_REPLICA_URLS = [
+    url.strip() for url in os.getenv("ASYNC_REPLICA_DATABASE_URLS", os.getenv("ASYNC_READ_DATABASE_URL", "")).split(",")
+    if url.strip()
+]
+# After a client writes, its reads go to the primary for this many seconds, so it reads its own
+# writes however far the replicas lag behind (as long as that is less)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# Cookie (and header) carrying the Unix time until which a client's reads go to the primary
+READ_PRIMARY_UNTIL = "read-primary-until"
+# Projects can be spread over more databases (shards), each with its own write lock: DATABASE_URL is
+# shard 0 and these (comma-separated, in a fixed order) are shards 1, 2, ...
+SQLALCHEMY_SHARD_URLS = [url.strip() for url in os.getenv("SHARD_DATABASE_URLS", "").split(",") if url.strip()]
+ASYNC_SQLALCHEMY_SHARD_URLS = [
+    url.strip() for url in os.getenv("ASYNC_SHARD_DATABASE_URLS", "").split(",") if url.strip()
+] or [url.replace("sqlite://", "sqlite+aiosqlite://", 1) for url in SQLALCHEMY_SHARD_URLS]
+# A project ID holds its shard's index above this many bits, so IDs are unique across shards and
+# route to their shard without a lookup
+SHARD_ID_BITS = 40
+# Projects a shard can hold: the timeline index keeps an ID's offset within its shard as a 32-bit
+# signed coordinate, so the schema rejects IDs past this offset
+SHARD_CAPACITY = 2**31 - 1
+
+if ASYNC_SQLALCHEMY_REPLICA_URLS and SQLALCHEMY_SHARD_URLS:
+    raise RuntimeError("Read replicas (ASYNC_REPLICA_DATABASE_URLS) can't be combined with shards "
+                       "(SHARD_DATABASE_URLS).")
+
+
+@dataclass(frozen=True)
+class SQLiteProfile:
+    """PRAGMA settings applied to every new SQLite connection."""
+
+    journal_mode: str
+    synchronous: str
+    mmap_size: int
+    cache_size: int
+    busy_timeout: int
+    # Take the write lock when a write transaction starts instead of on its first write, so
+    # concurrent writers wait on busy_timeout rather than failing with "database is locked"
+    begin_immediate: bool
+
+
+SQLITE_PROFILES = {
+    # WAL lets readers run alongside the single writer; synchronous=NORMAL is durable across
+    # application crashes and only fsyncs at checkpoints
+    "production": SQLiteProfile(journal_mode="WAL", synchronous="NORMAL", mmap_size=256 * 1024 * 1024,
+                                cache_size=-64 * 1024, busy_timeout=5000, begin_immediate=True),
+    # SQLite defaults: rollback journal, fsync on every commit
+    "safe": SQLiteProfile(journal_mode="DELETE", synchronous="FULL", mmap_size=0,
+                          cache_size=-2000, busy_timeout=5000, begin_immediate=False),
+}
+
+
+def get_sqlite_profile() -> SQLiteProfile:
+    """Pick the profile named by ``DB_PROFILE`` and apply any ``SQLITE_*`` overrides."""
+
+    profile = SQLITE_PROFILES[os.getenv("DB_PROFILE", "production")]
+    overrides = {}
+    for field, cast in (("journal_mode", str), ("synchronous", str), ("mmap_size", int),
+                        ("cache_size", int), ("busy_timeout", int)):
+        value = os.getenv(f"SQLITE_{field.upper()}")
+        if value is not None:
+            overrides[field] = cast(value)
+    if os.getenv("SQLITE_BEGIN_IMMEDIATE") is not None:
+        overrides["begin_immediate"] = os.getenv("SQLITE_BEGIN_IMMEDIATE").lower() == "true"
+    return replace(profile, **overrides)
+
+
+def configure_sqlite_engine(engine, profile: SQLiteProfile, read_only: bool = False):
+    """Apply ``profile`` to every connection of a SQLite engine (sync or async)."""
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name != "sqlite":
+        return engine
+    begin_immediate = profile.begin_immediate and not read_only
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if begin_immediate:
+            # Let SQLAlchemy emit BEGIN itself, see the "begin" listener below
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={profile.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={profile.synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={profile.mmap_size}")
+        cursor.execute(f"PRAGMA cache_size={profile.cache_size}")
+        cursor.execute(f"PRAGMA busy_timeout={profile.busy_timeout}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    if begin_immediate:
+        @event.listens_for(sync_engine, "begin")
+        def begin_immediate_transaction(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+
+sqlite_profile = get_sqlite_profile()
+pool_options = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+}
+read_pool_options = {**pool_options, "pool_size": int(os.getenv("DB_READ_POOL_SIZE", "20"))}
+
+class LazyEngine:
+    """Engine built on first use, so importing the app neither creates it nor loads its dialect."""
+
+    def __init__(self, name: str, build):
+        self.name = name
+        self._build = build
+        self._engine = None
+        # Pool utilisation for /metrics; all zeros until the engine exists
+        db_pool_connections.add_callback(lambda: pool_state(self._engine, name))
+
+    def get(self):
+        if self._engine is None:
+            # Statement timings for /metrics
+            self._engine = instrument_engine(self._build(), self.name, track_pool=False)
+        return self._engine
+
+    @property
+    def created(self) -> bool:
+        return self._engine is not None
+
+
+class LazySessionMaker:
+    """Session factory that builds its engine when the first session is created."""
+
+    def __init__(self, engine: LazyEngine, factory, **options):
+        self.engine = engine
+        self._factory = factory
+        self._options = options
+        self._sessionmaker = None
+
+    def __call__(self, **local_kw):
+        if self._sessionmaker is None:
+            self._sessionmaker = self._factory(bind=self.engine.get(), **self._options)
+        return self._sessionmaker(**local_kw)
+
+
+def read_engine(name: str, url: str) -> LazyEngine:
+    """Read-only engine with its own pool, so reads never queue behind writers for a connection."""
+
+    return LazyEngine(name, lambda: configure_sqlite_engine(
+        create_async_engine(url, echo=False, **read_pool_options),
+        sqlite_profile,
+        read_only=True,
+    ))
+
+
+def read_sessions(engine: LazyEngine) -> LazySessionMaker:
+    return LazySessionMaker(engine, async_sessionmaker, autoflush=False, expire_on_commit=False)
+
+
+class Shard:
+    """One of the databases projects are spread over, with its engines and session factories.
+
+    Shard ``index`` holds the projects with IDs from ``first_id`` to ``last_id``. The schema setup
+    (``models.init_shard``) makes its ID sequence start at ``first_id``.
+    """
+
+    def __init__(self, index: int, url: str, async_url: str = None, read_name: str = None):
+        self.index = index
+        self.url = url
+        self.first_id = (index << SHARD_ID_BITS) + 1
+        self.last_id = (index << SHARD_ID_BITS) + SHARD_CAPACITY
+        async_url = async_url or url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+        # Metric labels: shard 0 keeps the unsharded engine names
+        prefix = f"shard-{index}-" if index else ""
+        # Synchronous engine, used for schema creation and scripts
+        self.engine = LazyEngine(f"{prefix}sync", lambda: configure_sqlite_engine(
+            create_engine(url, connect_args={"check_same_thread": False}, echo=False),
+            sqlite_profile,
+        ))
+        # Asynchronous engine, used by the API so DB round trips don't block the event loop
+        self.async_engine = LazyEngine(f"{prefix}write", lambda: configure_sqlite_engine(
+            create_async_engine(async_url, echo=False, **pool_options),
+            sqlite_profile,
+        ))
+        self.sessions = LazySessionMaker(self.async_engine, async_sessionmaker, autoflush=False,
+                                         expire_on_commit=False)
+        # Reads that must see the latest writes
+        self.read_engine = read_engine(read_name or f"{prefix}read", async_url)
+        self.read_sessions = read_sessions(self.read_engine)
+
+
+shards = [
+    Shard(0, SQLALCHEMY_DATABASE_URL, ASYNC_SQLALCHEMY_DATABASE_URL,
+          read_name="read" if not ASYNC_SQLALCHEMY_REPLICA_URLS else "primary-read"),
+    *(Shard(index, url, async_url) for index, (url, async_url)
+      in enumerate(zip(SQLALCHEMY_SHARD_URLS, ASYNC_SQLALCHEMY_SHARD_URLS), start=1)),
+]
+# New projects go to the shards in turn
+_next_shard = itertools.cycle(shards)
+
+
+def shard_index(project_id: int) -> int:
+    """Index of the shard holding ``project_id``; IDs past the last shard's range map to it (and aren't found)."""
+
+    return min(max(project_id, 0) >> SHARD_ID_BITS, len(shards) - 1)
+
+
+# The primary (shard 0) under the names used before sharding
+engine = shards[0].engine
+SessionLocal = LazySessionMaker(engine, sessionmaker, autocommit=False, autoflush=False)
+async_engine = shards[0].async_engine
+AsyncSessionLocal = shards[0].sessions
+async_primary_read_engine = shards[0].read_engine
+AsyncPrimaryReadSessionLocal = shards[0].read_sessions
+
+# All other reads, spread round-robin over the replicas; without replicas they go to the primary
+async_replica_engines = [
+    read_engine("read" if index == 0 else f"read-{index + 1}", url)
+    for index, url in enumerate(ASYNC_SQLALCHEMY_REPLICA_URLS)
+] or [async_primary_read_engine]
+ReplicaSessionLocals = [read_sessions(engine) for engine in async_replica_engines]
+_next_replica = itertools.cycle(ReplicaSessionLocals)
+
+# Background readers (e.g. the change feed) read from the first replica
+async_read_engine = async_replica_engines[0]
+AsyncReadSessionLocal = ReplicaSessionLocals[0]
+
+
+async def dispose_engines():
+    """Close the pooled connections of the async engines that were created."""
+
+    lazy_engines = {*async_replica_engines}
+    for shard in shards:
+        lazy_engines.update((shard.async_engine, shard.read_engine))
+    for lazy_engine in lazy_engines:
+        if lazy_engine.created:
+            await lazy_engine.get().dispose()
 
 
 def get_db():
@@ -12,3 +258,108 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def _path_shard(request: Request):
+    """The shard of the project addressed by the request path (``/projects/{project_id}``), if any."""
+
+    project_id = request.path_params.get("project_id")
+    try:
+        return shards[shard_index(int(project_id))] if project_id is not None else None
+    except ValueError:
+        # Not an ID; FastAPI rejects the request
+        return None
+
+
+async def get_async_db(request: Request):
+    # Writes to a project go to its shard; new projects go to the next shard in turn
+    shard = _path_shard(request) or next(_next_shard)
+    db = shard.sessions()
+    db.info["shard"] = shard.index
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_async_shard_dbs():
+    """Write sessions of every shard, in shard order, for writes spanning shards."""
+
+    dbs = [shard.sessions() for shard in shards]
+    for shard, db in zip(shards, dbs):
+        db.info["shard"] = shard.index
+    try:
+        yield dbs
+    finally:
+        for db in dbs:
+            await db.close()
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware sending a client's reads to the primary for a while after it writes.
+
+    Successful requests other than GET, HEAD and OPTIONS get a ``read-primary-until`` cookie and
+    response header holding ``now + window``. Browsers send the cookie back; other clients can echo
+    the header. Until then ``get_async_read_db`` reads from the primary instead of a replica.
+    """
+
+    def __init__(self, app, window: float = READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_read_primary(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = f"{time.time() + self.window:.3f}"
+                cookie = f"{READ_PRIMARY_UNTIL}={until}; Max-Age={math.ceil(self.window)}; Path=/; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"set-cookie", cookie.encode()),
+                                                  (READ_PRIMARY_UNTIL.encode(), until.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_read_primary)
+
+
+def reads_from_primary(request: Request) -> bool:
+    """Whether the client wrote within the last ``READ_YOUR_WRITES_SECONDS`` (see ReadYourWritesMiddleware)."""
+
+    value = request.headers.get(READ_PRIMARY_UNTIL) or request.cookies.get(READ_PRIMARY_UNTIL)
+    try:
+        return value is not None and float(value) > time.time()
+    except ValueError:
+        return False
+
+
+def _read_session(request: Request, shard: Shard):
+    if shard.index:
+        # Shards have no replicas
+        return shard.read_sessions()
+    if reads_from_primary(request):
+        return AsyncPrimaryReadSessionLocal()
+    db = next(_next_replica)()
+    # Replica rows may be stale; services don't cache them (see get_project_by_id_service)
+    db.info["replica"] = bool(ASYNC_SQLALCHEMY_REPLICA_URLS)
+    return db
+
+
+async def get_async_read_db(request: Request):
+    db = _read_session(request, _path_shard(request) or shards[0])
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_async_shard_read_dbs(request: Request):
+    """Read sessions of every shard, in shard order, for reads gathered from all of them."""
+
+    dbs = [_read_session(request, shard) for shard in shards]
+    try:
+        yield dbs
+    finally:
+        for db in dbs:
+            await db.close()
@@ -0,0 +1,46 @@
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize plain dicts/lists containing dates and datetimes to JSON bytes.
+
+    Uses orjson when it is installed and falls back to the standard library otherwise.
+    """
+
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+def loads(payload: bytes) -> Any:
+    """Parse JSON bytes, with orjson when it is installed."""
+
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered straight from plain Python data, without ``jsonable_encoder``.
+
+    Routes return it directly on hot read paths, so FastAPI neither validates the payload
+    against the response model nor walks it again before rendering.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+
+from sqlalchemy import insert, update
+
+from cache import project_cache
+from database import AsyncSessionLocal, shards
+from metrics import group_commit_batch_size
+from models import ProjectManagementSystem
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitter:
+    """Coalesce single-project writes from concurrent requests into shared transactions.
+
+    Callers enqueue a write and wait; one writer task takes up to ``max_batch`` queued writes, waiting
+    at most ``max_delay`` seconds for more after the first, applies them in one transaction and
+    commits once. A caller is only answered after that commit, so durability is the same as with a
+    commit per request; the price is up to ``max_delay`` of added latency when traffic is light.
+    Even with no delay, writes that arrive while a batch is being committed share the next commit.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, max_batch: int = 64, max_delay: float = 0.0):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = None
+        self._writer = None
+        self._loop = None
+
+    async def create(self, values: dict):
+        """Insert a project and return it once committed."""
+
+        return await self._submit(("create", values))
+
+    async def update(self, project_id: int, changes: dict):
+        """Update a live project and return it once committed, or None if it doesn't exist."""
+
+        return await self._submit(("update", project_id, changes))
+
+    async def _submit(self, write):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._writer.done():
+            # The writer belongs to the event loop it was started on
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._writer = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((write, future))
+        return await future
+
+    async def close(self):
+        """Flush the queued writes and stop the writer."""
+
+        if self._writer is None or self._loop is not asyncio.get_running_loop():
+            return
+        await self._queue.join()
+        self._writer.cancel()
+        self._writer = self._loop = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch):
+        try:
+            async with self.session_factory() as db:
+                results = await self._apply(db, [write for write, _ in batch])
+                await db.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                # Retry the writes one by one so a single bad write doesn't fail the others
+                logger.error(f"Error in group commit of {len(batch)} writes, retrying individually: {str(e)}")
+                for item in batch:
+                    await self._flush([item])
+                return
+            _, future = batch[0]
+            if not future.done():
+                future.set_exception(e)
+            return
+        group_commit_batch_size.observe(len(batch))
+        try:
+            await project_cache.delete(*(write[1] for write, _ in batch if write[0] == "update"))
+        except Exception as e:
+            # The writes are committed, so their callers still get them; stale entries expire with the TTL
+            logger.error(f"Error invalidating the cache after a group commit: {str(e)}")
+        for (_, future), result in zip(batch, results):
+            # The caller may have gone away (e.g. the client disconnected)
+            if not future.done():
+                future.set_result(result)
+
+    async def _apply(self, db, writes):
+        results = [None] * len(writes)
+        # All creates of the batch go in one multi-row INSERT
+        creates = [index for index, write in enumerate(writes) if write[0] == "create"]
+        if creates:
+            result = await db.execute(
+                insert(ProjectManagementSystem)
+                .values([writes[index][1] for index in creates])
+                .returning(ProjectManagementSystem)
+            )
+            # RETURNING has no defined order, but the transaction holds the write lock, so the rows got
+            # ascending IDs in the order of the VALUES list
+            for index, project in zip(creates, sorted(result.scalars().all(), key=lambda project: project.id)):
+                results[index] = project
+        for index, write in enumerate(writes):
+            if write[0] == "update":
+                _, project_id, changes = write
+                result = await db.execute(
+                    update(ProjectManagementSystem)
+                    .where(ProjectManagementSystem.id == project_id, ProjectManagementSystem.deleted_at.is_(None))
+                    .values(**changes)
+                    .returning(ProjectManagementSystem)
+                )
+                results[index] = result.scalars().first()
+        return results
+
+
+def create_group_committer(session_factory=AsyncSessionLocal):
+    """Build a group committer from the ``GROUP_COMMIT*`` environment variables, or None when disabled.
+
+    ``GROUP_COMMIT=true`` enables it; ``GROUP_COMMIT_MAX_BATCH`` and ``GROUP_COMMIT_MAX_DELAY_MS`` bound
+    how many writes share a commit and how long the first of them may wait for company.
+    """
+
+    if os.getenv("GROUP_COMMIT", "false").lower() != "true":
+        return None
+    return GroupCommitter(
+        session_factory,
+        max_batch=int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64")),
+        max_delay=float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", "0")) / 1000,
+    )
+
+
+# One per shard, as a transaction can't span databases
+group_committers = [committer for committer in (create_group_committer(shard.sessions) for shard in shards)
+                    if committer is not None]
+group_committer = group_committers[0] if group_committers else None
+
+
+def group_committer_for(db):
+    """The group committer of the shard ``db`` writes to (see ``get_async_db``), or None when disabled."""
+
+    return group_committers[db.info.get("shard", 0)] if group_committers else None
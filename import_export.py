@@ -0,0 +1,158 @@
+import codecs
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from fastapi import status, HTTPException
+from pydantic import ValidationError
+
+from schemas import ProjectCreate
+from services import BULK_BATCH_SIZE, PROJECT_COLUMNS, import_projects_service
+
+EXPORT_COLUMNS = tuple(column.name for column in PROJECT_COLUMNS)
+REQUIRED_IMPORT_COLUMNS = tuple(name for name, field in ProjectCreate.model_fields.items() if field.is_required())
+# Longest line (or quoted multi-line CSV record) accepted by an import; guards memory
+IMPORT_MAX_LINE_LENGTH = 1024 * 1024
+# Rejected lines an import reports in detail; any further ones are only counted
+IMPORT_MAX_REPORTED_ERRORS = 1000
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+async def render_csv(chunks):
+    """Render chunks of project row mappings as CSV, header first, one encoded chunk at a time."""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    async for chunk in chunks:
+        writer.writerows([_csv_value(row[name]) for name in EXPORT_COLUMNS] for row in chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def _lines(body):
+    """Split an async stream of UTF-8 byte chunks into lists of lines, one list per chunk."""
+
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    try:
+        async for chunk in body:
+            *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+            if len(pending) > IMPORT_MAX_LINE_LENGTH:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Lines longer than {IMPORT_MAX_LINE_LENGTH} characters are not accepted.",
+                )
+            if lines:
+                yield [line.rstrip("\r") for line in lines]
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The upload is not valid UTF-8.")
+    if pending:
+        yield [pending.rstrip("\r")]
+
+
+async def parse_ndjson(body):
+    """Yield ``(line number, record, error)`` for each non-blank line of an NDJSON upload."""
+
+    line_number = 0
+    async for lines in _lines(body):
+        for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line), None
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {str(e)}"
+
+
+async def parse_csv(body):
+    """Yield ``(line number, record, error)`` for each row of a CSV upload with a header row.
+
+    Quoted fields may span lines; a row is reported at the line it starts on.
+    """
+
+    header = None
+    record, start, line_number = [], 0, 0
+    async for lines in _lines(body):
+        for line in lines:
+            line_number += 1
+            if not record:
+                start = line_number
+            record.append(line)
+            text = "\n".join(record)
+            # An odd number of quotes means a quoted field continues on the next line
+            if text.count('"') % 2:
+                if len(text) > IMPORT_MAX_LINE_LENGTH:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Records longer than {IMPORT_MAX_LINE_LENGTH} characters are not accepted.",
+                    )
+                continue
+            record = []
+            if not text.strip():
+                continue
+            values = next(csv.reader([text]))
+            if header is None:
+                header = [name.strip() for name in values]
+                missing = [name for name in REQUIRED_IMPORT_COLUMNS if name not in header]
+                if missing:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"The CSV header is missing the columns: {', '.join(missing)}.",
+                    )
+            elif len(values) != len(header):
+                yield start, None, f"Expected {len(header)} fields, found {len(values)}."
+            else:
+                yield start, dict(zip(header, values)), None
+    if record:
+        yield start, None, "Unterminated quoted field."
+
+
+async def import_project_records(db, records, batch_size: int = BULK_BATCH_SIZE):
+    """Validate parsed records against ``ProjectCreate`` and insert the valid ones in batches.
+
+    Each batch of ``batch_size`` valid projects is inserted and committed as soon as it is full, so
+    memory stays bounded by the batch size and invalid lines never abort the load. Returns the number
+    of imported projects, the number of rejected lines and the details of the first rejections.
+    """
+
+    imported = rejected = 0
+    errors, batch = [], []
+
+    def reject(line_number, line_errors):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+            errors.append({"line": line_number, "errors": line_errors})
+
+    async for line_number, record, error in records:
+        if error is not None:
+            reject(line_number, [{"loc": [], "msg": error}])
+            continue
+        try:
+            batch.append(ProjectCreate.model_validate(record))
+        except ValidationError as e:
+            reject(line_number, [{"loc": list(error["loc"]), "msg": error["msg"]} for error in e.errors()])
+            continue
+        if len(batch) >= batch_size:
+            imported += await import_projects_service(db=db, projects=batch)
+            batch = []
+    if batch:
+        imported += await import_projects_service(db=db, projects=batch)
+    return imported, rejected, errors
@@ -1,16 +1,76 @@
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
+# Listener draining the log queue; set once by setup_logging
+_listener = None
 
-def setup_logging(log_file='app.log', log_level=logging.INFO):
-    """ Set up logging configuration."""
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread and never blocks.
+
+    When the queue is full (e.g. during an error storm) records are dropped and counted
+    instead of stalling the request that logged them.
+    """
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Only merge the message arguments here; formatting happens in the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+def setup_logging(log_file='app.log', log_level=logging.INFO, log_format=None):
+    """ Set up logging configuration.
+
+    Safe to call more than once: only the first call configures logging. Log records are
+    put on a bounded queue and written to the console and the log file by a background
+    thread. ``log_format`` (or the ``LOG_FORMAT`` environment variable) selects ``text``
+    or ``json`` output.
+    """
+
+    global _listener
+    if _listener is not None:
+        return
 
     # Create a logger and Set the logging level
     logger = logging.getLogger()
     logger.setLevel(log_level)
 
     # Create a formatter
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    log_format = log_format or os.getenv("LOG_FORMAT", "text")
+    if log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
     # Create a console handler and set the format
     console_handler = logging.StreamHandler()
@@ -32,6 +92,10 @@ def setup_logging(log_file='app.log', log_level=logging.INFO):
     if logger.hasHandlers():
         logger.handlers.clear()
 
-    # Add handlers to the logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    # Route records through a queue so disk I/O and rotation happen off the request thread
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    logger.addHandler(NonBlockingQueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
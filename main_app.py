@@ -1,11 +1,50 @@
-import uvicorn
+import asyncio
+import os
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
+from admission import ADMISSION_CONTROL, AdmissionMiddleware
+from archival import ARCHIVE_INTERVAL, archive_periodically
+from cache import project_cache
+from change_feed import change_feeds
+from database import ASYNC_SQLALCHEMY_REPLICA_URLS, ReadYourWritesMiddleware, dispose_engines
+from group_commit import group_committers
+from log_config import setup_logging, NonBlockingQueueHandler
+from metrics import registry, Gauge, MetricsMiddleware
 from models import init_db
+from profiling import PROFILING_ENABLED, ProfilingMiddleware
 from projects_routes import projects_router
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup work happens here rather than on import, so importing the app (tests, scripts, every
+    # worker boot) stays cheap; the database engines are only created by the first session
+    setup_logging()
+    # Create or migrate the schema, unless the deployment says it is in place (see serve.py)
+    if os.getenv("DB_SCHEMA_READY", "false").lower() != "true":
+        await asyncio.to_thread(init_db)
+    # Move old soft-deleted projects out of the hot table in the background
+    archival = asyncio.create_task(archive_periodically()) if ARCHIVE_INTERVAL > 0 else None
+    yield
+    if archival is not None:
+        archival.cancel()
+        with suppress(asyncio.CancelledError):
+            await archival
+    for group_committer in group_committers:
+        # Don't drop writes that are still queued
+        await group_committer.close()
+    await dispose_engines()
+
+
+app = FastAPI(lifespan=lifespan)
+
+if ADMISSION_CONTROL:
+    # Shed requests over their class's budget with a fast 503, inside CORS so browsers can read it
+    app.add_middleware(AdmissionMiddleware)
 
 # CORS Middleware
 app.add_middleware(
@@ -16,9 +55,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize the database
-init_db()
+if PROFILING_ENABLED:
+    # Requests sent with X-Profile: 1 get a profile report instead of their response
+    app.add_middleware(ProfilingMiddleware)
 
+# Request counts, latency and DB usage per route, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
+if ASYNC_SQLALCHEMY_REPLICA_URLS:
+    # Reads right after a client's own writes go to the primary, not a lagging replica
+    app.add_middleware(ReadYourWritesMiddleware)
+
+registry.register(Gauge(
+    "project_cache", "Project cache size and hit/miss/eviction counters.", ("stat",),
+    lambda: [((key,), value) for key, value in project_cache.stats().items() if key != "backend"],
+))
+registry.register(Gauge(
+    "log_records_dropped", "Log records dropped because the log queue was full.",
+    callback=lambda: [((), NonBlockingQueueHandler.dropped)],
+))
+registry.register(Gauge(
+    "change_feed_subscribers", "Open change feed subscriptions.",
+    callback=lambda: [((), sum(feed.subscribers for feed in change_feeds))],
+))
 
 @app.get("/", response_model=dict, status_code=status.HTTP_200_OK)
 async def index() -> dict:
@@ -32,7 +91,15 @@ async def index() -> dict:
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(projects_router)
 
 if __name__ == '__main__':
+    import uvicorn
+
     uvicorn.run("main_app:app", host="0.0.0.0", port=8181, reload=True)
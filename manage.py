@@ -0,0 +1,115 @@
+"""Maintenance commands.
+
+Usage:
+    python manage.py init-db                Create the tables and the search index
+    python manage.py rebuild-search-index   Re-index every project for GET /projects/search
+    python manage.py rebuild-stats          Recompute the counts behind GET /projects/stats
+    python manage.py rebuild-timeline       Re-index project dates for GET /projects/timeline
+    python manage.py archive-deleted        Archive old soft-deleted projects now (see ARCHIVE_*)
+    python manage.py sync-replicas          Copy the primary over the SQLite replicas (see ASYNC_REPLICA_*)
+
+Every command but sync-replicas runs on each shard (see SHARD_DATABASE_URLS).
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from sqlalchemy.engine import make_url
+
+from archival import archive_deleted_projects
+
+from database import ASYNC_SQLALCHEMY_DATABASE_URL, ASYNC_SQLALCHEMY_REPLICA_URLS, shards, sqlite_profile
+from models import init_db, rebuild_search_index, rebuild_project_stats, rebuild_timeline_index
+
+
+def rebuild_search_index_command():
+    init_db()
+    count = 0
+    for shard in shards:
+        with shard.engine.get().begin() as connection:
+            rebuild_search_index(connection)
+            count += connection.exec_driver_sql("SELECT count(*) FROM projects").scalar()
+    print(f"Search index rebuilt for {count} projects.")
+
+
+def rebuild_stats_command():
+    init_db()
+    for shard in shards:
+        with shard.engine.get().begin() as connection:
+            rebuild_project_stats(connection)
+    print("Project statistics rebuilt.")
+
+
+def rebuild_timeline_command():
+    init_db()
+    count = 0
+    for shard in shards:
+        with shard.engine.get().begin() as connection:
+            rebuild_timeline_index(connection)
+            count += connection.exec_driver_sql("SELECT count(*) FROM projects_timeline").scalar()
+    print(f"Timeline index rebuilt for {count} projects.")
+
+
+def archive_deleted_command():
+    init_db()
+    archived = asyncio.run(archive_deleted_projects())
+    print(f"Archived {archived} deleted projects.")
+
+
+def sqlite_path(url):
+    """File of a SQLite database URL, or None for other databases and in-memory ones."""
+
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    return url.database
+
+
+def sync_replicas():
+    """Copy the primary over every SQLite replica with the online backup API; returns how many were synced.
+
+    A stand-in for real replication when testing replicas locally: readers of a replica see it
+    change all at once, and in between it lags behind the primary.
+    """
+
+    primary = sqlite_path(ASYNC_SQLALCHEMY_DATABASE_URL)
+    replicas = [path for path in map(sqlite_path, ASYNC_SQLALCHEMY_REPLICA_URLS) if path and path != primary]
+    if primary is None or not replicas:
+        return 0
+    with closing(sqlite3.connect(primary)) as source:
+        for replica in replicas:
+            with closing(sqlite3.connect(replica)) as target:
+                target.execute(f"PRAGMA busy_timeout={sqlite_profile.busy_timeout}")
+                source.backup(target)
+    return len(replicas)
+
+
+def sync_replicas_command():
+    init_db()
+    # With REPLICA_SYNC_INTERVAL_SECONDS set, keep syncing until interrupted
+    interval = float(os.getenv("REPLICA_SYNC_INTERVAL_SECONDS", "0"))
+    while True:
+        synced = sync_replicas()
+        print(f"Synced {synced} replicas.")
+        if interval <= 0:
+            break
+        time.sleep(interval)
+
+
+COMMANDS = {
+    "init-db": init_db,
+    "rebuild-search-index": rebuild_search_index_command,
+    "rebuild-stats": rebuild_stats_command,
+    "rebuild-timeline": rebuild_timeline_command,
+    "archive-deleted": archive_deleted_command,
+    "sync-replicas": sync_replicas_command,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=COMMANDS)
+    COMMANDS[parser.parse_args().command]()
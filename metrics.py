@@ -0,0 +1,236 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy import event
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Buckets for "how many statements did this request run"
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, labels, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(labelnames, labels), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1.0):
+        with self._lock:
+            self._values[labels] += amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self):
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # Per label set: [per-bucket counts (+Inf last), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, *labels) -> int:
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def samples(self):
+        for labels, (bucket_counts, total, count) in list(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), bucket_counts):
+                cumulative += bucket_count
+                label_text = _format_labels(self.labelnames, labels, (("le", bound),))
+                yield f"{self.name}_bucket{label_text} {cumulative}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {total}"
+            yield f"{self.name}_count{label_text} {count}"
+
+
+class Gauge:
+    """Gauge whose samples are read from a callback at scrape time."""
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._callbacks = [callback] if callback else []
+
+    def add_callback(self, callback):
+        """Register a callable returning ``[(labels, value), ...]``."""
+
+        self._callbacks.append(callback)
+
+    def samples(self):
+        for callback in self._callbacks:
+            for labels, value in callback():
+                yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by method, route and status code.", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route.", ("method", "route")))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request.", ("route",), QUERY_COUNT_BUCKETS))
+db_time_per_request = registry.register(Histogram(
+    "db_time_per_request_seconds", "Time spent executing SQL per HTTP request.", ("route",)))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time by engine.", ("engine",)))
+db_pool_connections = registry.register(Gauge(
+    "db_pool_connections", "Connection pool state by engine: size, checked_out and overflow.", ("engine", "state")))
+service_errors = registry.register(Counter(
+    "service_errors_total", "Unexpected errors turned into HTTP 500 responses by the services.", ("service",)))
+group_commit_batch_size = registry.register(Histogram(
+    "group_commit_batch_size", "Writes committed together by the group committer.", (), BATCH_SIZE_BUCKETS))
+
+
+class RequestDBStats:
+    __slots__ = ("queries", "duration", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+        # (SQL, seconds) of every statement, when the request is being profiled
+        self.statements = None
+
+
+# DB statistics of the HTTP request being handled, set by MetricsMiddleware
+current_request_db_stats = contextvars.ContextVar("current_request_db_stats", default=None)
+
+
+def pool_state(engine, name: str):
+    """Samples of the connection pool of ``engine`` (sync or async), all zero while it is None."""
+
+    if engine is None:
+        return [((name, "size"), 0), ((name, "checked_out"), 0), ((name, "overflow"), 0)]
+    pool = getattr(engine, "sync_engine", engine).pool
+    if not hasattr(pool, "checkedout"):
+        return []
+    return [((name, "size"), pool.size()), ((name, "checked_out"), pool.checkedout()),
+            ((name, "overflow"), max(pool.overflow(), 0))]
+
+
+def instrument_engine(engine, name: str, track_pool: bool = True):
+    """Record statement timings and pool state of ``engine`` (sync or async) under ``name``.
+
+    Pass ``track_pool=False`` when the pool is already reported, see ``pool_state``.
+    """
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def record_query_time(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        db_query_duration.observe(elapsed, name)
+        stats = current_request_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.duration += elapsed
+            if stats.statements is not None:
+                stats.statements.append((statement, elapsed))
+
+    if track_pool:
+        db_pool_connections.add_callback(lambda: pool_state(engine, name))
+    return engine
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request counts, latency and DB usage."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                response_status[0] = message["status"]
+            await send(message)
+
+        # Keep the stats of an outer middleware (ProfilingMiddleware) so both see every statement
+        stats, token = current_request_db_stats.get(), None
+        if stats is None:
+            stats = RequestDBStats()
+            token = current_request_db_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            if token is not None:
+                current_request_db_stats.reset(token)
+            # Label by route template, not by raw path, to keep the label set bounded
+            route = scope.get("route")
+            route = getattr(route, "path", "unmatched")
+            http_requests.inc(scope["method"], route, str(response_status[0]))
+            http_request_duration.observe(elapsed, scope["method"], route)
+            db_queries_per_request.observe(stats.queries, route)
+            db_time_per_request.observe(stats.duration, route)
@@ -1,12 +1,23 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Index, MetaData, event, table, column
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.sql import func
 
-from database import engine
+from database import SHARD_CAPACITY, SHARD_ID_BITS, engine, shards
 
 Base = declarative_base()
 
 
+def utcnow():
+    # Microsecond precision, so every write changes updated_at (and therefore the ETag)
+    return datetime.now(timezone.utc)
+
+
 class ProjectManagementSystem(Base):
     __tablename__ = 'projects'
 
@@ -17,9 +28,19 @@ class ProjectManagementSystem(Base):
     project_end_date = Column(Date)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now(), onupdate=utcnow)
     deleted_at = Column(DateTime(timezone=True), nullable=True)
 
+    __table_args__ = (
+        # Partial indexes: reads only touch live rows and archival only touches deleted ones, so
+        # neither slows down as the other kind of row piles up
+        Index("ix_projects_live", "id", sqlite_where=deleted_at.is_(None)),
+        Index("ix_projects_deleted_at", "deleted_at", sqlite_where=deleted_at.isnot(None)),
+        # AUTOINCREMENT: IDs are never reused, and a shard's IDs start where its sequence is seeded
+        # (see claim_shard)
+        {"sqlite_autoincrement": True},
+    )
+
     def to_dict(self):
         """Convert SQLAlchemy model instance to a dictionary."""
 
@@ -36,5 +57,387 @@ class ProjectManagementSystem(Base):
         }
 
 
+class ProjectArchive(Base):
+    """Soft-deleted projects moved out of ``projects`` by the archival job."""
+
+    __tablename__ = 'projects_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    project_name = Column(String)
+    project_description = Column(String)
+    project_start_date = Column(Date)
+    project_end_date = Column(Date)
+    is_active = Column(Boolean)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    deleted_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), default=utcnow)
+
+
+class ProjectChange(Base):
+    """Change log of project mutations, in commit order; feeds GET /projects/changes."""
+
+    __tablename__ = 'project_changes'
+    # AUTOINCREMENT: sequence numbers are never reused, even after old entries are pruned
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    project_id = Column(Integer, nullable=False)
+    operation = Column(String, nullable=False)
+    changed_at = Column(DateTime(timezone=True), index=True)
+
+
+@event.listens_for(Base.metadata, "before_create")
+def migrate_projects_autoincrement(target, connection, **kw):
+    """Rebuild a ``projects`` table created without AUTOINCREMENT; create_all never alters an existing table.
+
+    Without it SQLite hands out the highest ID again once that project is archived, so two projects
+    would share an ID in the archive, the change log, the cache and ETags. The sequence starts past
+    every archived ID as well.
+    """
+
+    if connection.dialect.name != "sqlite":
+        return
+    sql = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'projects'"
+    ).scalar()
+    if sql is None or "AUTOINCREMENT" in sql.upper():
+        return
+    projects = ProjectManagementSystem.__table__
+    connection.execute(CreateTable(projects.to_metadata(MetaData(), name="projects_rebuilt")))
+    existing = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(projects)")}
+    names = ", ".join(column.name for column in projects.columns if column.name in existing)
+    connection.exec_driver_sql(f"INSERT INTO projects_rebuilt ({names}) SELECT {names} FROM projects")
+    # Its indexes and triggers go with the old table; create_all and the after_create hooks add them back
+    connection.exec_driver_sql("DROP TABLE projects")
+    connection.exec_driver_sql("ALTER TABLE projects_rebuilt RENAME TO projects")
+    archived = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'projects_archive'"
+    ).first()
+    last_id = connection.exec_driver_sql(
+        "SELECT max(id) FROM (SELECT max(id) AS id FROM projects"
+        + (" UNION ALL SELECT max(id) FROM projects_archive)" if archived else ")")
+    ).scalar()
+    if last_id is not None:
+        connection.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'projects'")
+        connection.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('projects', ?)", (last_id,))
+
+
+# Entries are written by triggers, so they commit (or roll back) together with the mutation that
+# caused them, whichever write path it took. A soft delete is logged as a delete
+CHANGE_LOG_DDL = (
+    """CREATE TRIGGER IF NOT EXISTS project_changes_insert AFTER INSERT ON projects
+    WHEN new.deleted_at IS NULL BEGIN
+        INSERT INTO project_changes (project_id, operation, changed_at) VALUES (new.id, 'create', new.updated_at);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS project_changes_update AFTER UPDATE ON projects
+    WHEN old.deleted_at IS NULL BEGIN
+        INSERT INTO project_changes (project_id, operation, changed_at)
+        VALUES (new.id, CASE WHEN new.deleted_at IS NULL THEN 'update' ELSE 'delete' END, new.updated_at);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS project_changes_delete AFTER DELETE ON projects
+    WHEN old.deleted_at IS NULL BEGIN
+        INSERT INTO project_changes (project_id, operation, changed_at) VALUES (old.id, 'delete', old.updated_at);
+    END""",
+)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_change_log_triggers(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in CHANGE_LOG_DDL:
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_missing_indexes(target, connection, **kw):
+    """Add indexes introduced after a database was created; create_all skips existing tables."""
+
+    for index in ProjectManagementSystem.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+# Full-text index over the project name and description. It is an external-content FTS5 table: it
+# stores only the index and reads the text back from ``projects``; the triggers keep it in sync with
+# every insert, update and delete, whichever code path makes them
+SEARCH_INDEX_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5(
+        project_name, project_description,
+        content='projects', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS projects_fts_insert AFTER INSERT ON projects BEGIN
+        INSERT INTO projects_fts(rowid, project_name, project_description)
+        VALUES (new.id, new.project_name, new.project_description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS projects_fts_delete AFTER DELETE ON projects BEGIN
+        INSERT INTO projects_fts(projects_fts, rowid, project_name, project_description)
+        VALUES ('delete', old.id, old.project_name, old.project_description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS projects_fts_update AFTER UPDATE OF project_name, project_description
+    ON projects BEGIN
+        INSERT INTO projects_fts(projects_fts, rowid, project_name, project_description)
+        VALUES ('delete', old.id, old.project_name, old.project_description);
+        INSERT INTO projects_fts(rowid, project_name, project_description)
+        VALUES (new.id, new.project_name, new.project_description);
+    END""",
+)
+
+# Lightweight handle on the FTS5 table for queries; it is created by the DDL above, not by create_all
+project_search = table("projects_fts", column("rowid"), column("project_name"), column("project_description"))
+
+
+def rebuild_search_index(connection):
+    """Re-index every project, e.g. after rows were written with the triggers missing."""
+
+    connection.exec_driver_sql("INSERT INTO projects_fts(projects_fts) VALUES ('rebuild')")
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_search_index(target, connection, **kw):
+    """Create the search index alongside the tables; index existing rows when it is new."""
+
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'projects_fts'"
+    ).first()
+    for statement in SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        rebuild_search_index(connection)
+
+
+# Live (not soft-deleted) project counts per start month and per end date, maintained by triggers so
+# that GET /projects/stats reads a handful of groups instead of scanning ``projects``. Missing dates
+# are counted under ''. Decrements leave zero-count rows behind; readers skip them
+STATS_DDL = (
+    """CREATE TABLE IF NOT EXISTS project_month_counts (
+        start_month TEXT NOT NULL, is_active INTEGER NOT NULL, count INTEGER NOT NULL,
+        PRIMARY KEY (start_month, is_active)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS project_end_date_counts (
+        end_date TEXT NOT NULL, is_active INTEGER NOT NULL, count INTEGER NOT NULL,
+        PRIMARY KEY (end_date, is_active)
+    ) WITHOUT ROWID""",
+    """CREATE TRIGGER IF NOT EXISTS project_counts_insert AFTER INSERT ON projects
+    WHEN new.deleted_at IS NULL BEGIN
+        INSERT INTO project_month_counts
+        VALUES (coalesce(substr(new.project_start_date, 1, 7), ''), coalesce(new.is_active, 0), 1)
+        ON CONFLICT (start_month, is_active) DO UPDATE SET count = count + 1;
+        INSERT INTO project_end_date_counts
+        VALUES (coalesce(substr(new.project_end_date, 1, 10), ''), coalesce(new.is_active, 0), 1)
+        ON CONFLICT (end_date, is_active) DO UPDATE SET count = count + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS project_counts_delete AFTER DELETE ON projects
+    WHEN old.deleted_at IS NULL BEGIN
+        UPDATE project_month_counts SET count = count - 1
+        WHERE start_month = coalesce(substr(old.project_start_date, 1, 7), '')
+          AND is_active = coalesce(old.is_active, 0);
+        UPDATE project_end_date_counts SET count = count - 1
+        WHERE end_date = coalesce(substr(old.project_end_date, 1, 10), '')
+          AND is_active = coalesce(old.is_active, 0);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS project_counts_update
+    AFTER UPDATE OF project_start_date, project_end_date, is_active, deleted_at ON projects BEGIN
+        UPDATE project_month_counts SET count = count - 1
+        WHERE old.deleted_at IS NULL
+          AND start_month = coalesce(substr(old.project_start_date, 1, 7), '')
+          AND is_active = coalesce(old.is_active, 0);
+        UPDATE project_end_date_counts SET count = count - 1
+        WHERE old.deleted_at IS NULL
+          AND end_date = coalesce(substr(old.project_end_date, 1, 10), '')
+          AND is_active = coalesce(old.is_active, 0);
+        INSERT INTO project_month_counts
+        SELECT coalesce(substr(new.project_start_date, 1, 7), ''), coalesce(new.is_active, 0), 1
+        WHERE new.deleted_at IS NULL
+        ON CONFLICT (start_month, is_active) DO UPDATE SET count = count + 1;
+        INSERT INTO project_end_date_counts
+        SELECT coalesce(substr(new.project_end_date, 1, 10), ''), coalesce(new.is_active, 0), 1
+        WHERE new.deleted_at IS NULL
+        ON CONFLICT (end_date, is_active) DO UPDATE SET count = count + 1;
+    END""",
+)
+
+project_month_counts = table("project_month_counts", column("start_month"), column("is_active"), column("count"))
+project_end_date_counts = table("project_end_date_counts", column("end_date"), column("is_active"), column("count"))
+
+
+def rebuild_project_stats(connection):
+    """Recompute the project counts from ``projects``."""
+
+    connection.exec_driver_sql("DELETE FROM project_month_counts")
+    connection.exec_driver_sql(
+        "INSERT INTO project_month_counts "
+        "SELECT coalesce(substr(project_start_date, 1, 7), ''), coalesce(is_active, 0), count(*) "
+        "FROM projects WHERE deleted_at IS NULL GROUP BY 1, 2"
+    )
+    connection.exec_driver_sql("DELETE FROM project_end_date_counts")
+    connection.exec_driver_sql(
+        "INSERT INTO project_end_date_counts "
+        "SELECT coalesce(substr(project_end_date, 1, 10), ''), coalesce(is_active, 0), count(*) "
+        "FROM projects WHERE deleted_at IS NULL GROUP BY 1, 2"
+    )
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_project_stats(target, connection, **kw):
+    """Create the count tables and their triggers; fill them from existing rows when they are new."""
+
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'project_month_counts'"
+    ).first()
+    for statement in STATS_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        rebuild_project_stats(connection)
+
+
+# R*Tree over the date span of every live project, in days since 1970-01-01, so GET /projects/timeline
+# finds the projects overlapping a range without scanning ``projects``. The project id is a second
+# (point) dimension, so a page can be read one id window at a time. A missing start or end date
+# leaves the span open on that side; an end before the start is indexed as the start day alone.
+# The id dimension holds the id's offset within its shard, as coordinates are 32-bit signed integers;
+# projects_id_limit keeps offsets within SHARD_CAPACITY, so they never wrap
+TIMELINE_ID = f"({{row}}.id & {(1 << SHARD_ID_BITS) - 1})"
+TIMELINE_START = "coalesce(CAST(julianday({row}.project_start_date) - 2440587.5 AS INTEGER), -2147483648)"
+TIMELINE_END = f"max(coalesce(CAST(julianday({{row}}.project_end_date) - 2440587.5 AS INTEGER), 2147483647), {TIMELINE_START})"
+TIMELINE_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS projects_timeline USING rtree_i32(
+        id, min_id, max_id, start_day, end_day
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS projects_timeline_insert AFTER INSERT ON projects
+    WHEN new.deleted_at IS NULL BEGIN
+        INSERT INTO projects_timeline
+        VALUES (new.id, {TIMELINE_ID.format(row="new")}, {TIMELINE_ID.format(row="new")},
+                {TIMELINE_START.format(row="new")}, {TIMELINE_END.format(row="new")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS projects_id_limit AFTER INSERT ON projects
+    WHEN {TIMELINE_ID.format(row="new")} > {SHARD_CAPACITY} BEGIN
+        SELECT RAISE(ABORT, 'project id is past the capacity of its shard');
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS projects_timeline_delete AFTER DELETE ON projects BEGIN
+        DELETE FROM projects_timeline WHERE id = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS projects_timeline_update
+    AFTER UPDATE OF project_start_date, project_end_date, deleted_at ON projects BEGIN
+        DELETE FROM projects_timeline WHERE id = old.id;
+        INSERT INTO projects_timeline
+        SELECT new.id, {TIMELINE_ID.format(row="new")}, {TIMELINE_ID.format(row="new")},
+               {TIMELINE_START.format(row="new")}, {TIMELINE_END.format(row="new")}
+        WHERE new.deleted_at IS NULL;
+    END""",
+)
+
+project_timeline = table("projects_timeline", column("id"), column("min_id"), column("max_id"),
+                         column("start_day"), column("end_day"))
+
+
+def rebuild_timeline_index(connection):
+    """Re-index the date spans of every live project."""
+
+    connection.exec_driver_sql("DELETE FROM projects_timeline")
+    connection.exec_driver_sql(
+        f"INSERT INTO projects_timeline SELECT id, {TIMELINE_ID.format(row='projects')}, "
+        f"{TIMELINE_ID.format(row='projects')}, {TIMELINE_START.format(row='projects')}, "
+        f"{TIMELINE_END.format(row='projects')} FROM projects WHERE deleted_at IS NULL"
+    )
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_timeline_index(target, connection, **kw):
+    """Create the timeline index and its triggers; index existing rows when it is new."""
+
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'projects_timeline'"
+    ).first()
+    for statement in TIMELINE_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        rebuild_timeline_index(connection)
+
+
+def claim_shard(connection, shard):
+    """Record which shard the database is and make its project IDs start at the shard's first ID.
+
+    A database keeps the shard index it was first set up as; starting it as another shard (e.g. after
+    reordering SHARD_DATABASE_URLS) raises, as its IDs would route elsewhere. Change log sequence
+    numbers get the same offset, so a change feed position tells which shard it belongs to.
+    """
+
+    if connection.dialect.name != "sqlite":
+        if shard.index:
+            raise RuntimeError("Shards other than the first need SQLite databases.")
+        return
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS project_shard (id INTEGER PRIMARY KEY CHECK (id = 1), shard_index INTEGER NOT NULL)"
+    )
+    connection.exec_driver_sql("INSERT OR IGNORE INTO project_shard (id, shard_index) VALUES (1, ?)", (shard.index,))
+    claimed = connection.exec_driver_sql("SELECT shard_index FROM project_shard").scalar()
+    if claimed != shard.index:
+        raise RuntimeError(f"{shard.url} is shard {claimed}, but is configured as shard {shard.index}.")
+    if not shard.index:
+        return
+    for name in ("projects", "project_changes"):
+        autoincrement = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ? AND sql LIKE '%AUTOINCREMENT%'", (name,)
+        ).first()
+        if not autoincrement:
+            raise RuntimeError(f"The {name} table of {shard.url} was created without AUTOINCREMENT, "
+                               f"so it can't be shard {shard.index}.")
+        if connection.exec_driver_sql("SELECT 1 FROM sqlite_sequence WHERE name = ?", (name,)).first():
+            connection.exec_driver_sql("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = ?",
+                                       (shard.first_id - 1, name))
+        else:
+            connection.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                                       (name, shard.first_id - 1))
+
+
+@contextmanager
+def _schema_lock(bind=None):
+    """Hold an exclusive file lock next to the database while the schema is set up.
+
+    Processes starting together (e.g. server workers) take turns, so only the first one creates
+    tables, indexes and triggers and the others find them in place.
+    """
+
+    url = (bind or engine).get().url
+    database = url.database if url.get_backend_name() == "sqlite" else None
+    if database and database != ":memory:":
+        path = os.path.abspath(database) + ".init.lock"
+    else:
+        path = os.path.join(tempfile.gettempdir(), "project-management-system.init.lock")
+    with open(path, "a+b") as lock_file:
+        if os.name == "nt":
+            import msvcrt
+            lock_file.seek(0)
+            # LK_LOCK retries for about 10 seconds before giving up
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def init_shard(shard):
+    with _schema_lock(shard.engine):
+        Base.metadata.create_all(bind=shard.engine.get())
+        with shard.engine.get().begin() as connection:
+            claim_shard(connection, shard)
+
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    for shard in shards:
+        init_shard(shard)
@@ -0,0 +1,139 @@
+import cProfile
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qs
+
+from sqlalchemy import event
+
+from database import LazyEngine, async_replica_engines, shards
+from fast_json import FastJSONResponse
+from metrics import RequestDBStats, current_request_db_stats
+
+# Off unless the deployment opts in: a profile shows the SQL and the code paths behind any request
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+# Functions listed in a profile report, slowest (cumulative time) first
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "30"))
+
+
+def profile_requested(scope) -> bool:
+    """Whether the request asks to be profiled, with ``X-Profile: 1`` or ``?profile=1``."""
+
+    flags = [value.decode() for name, value in scope["headers"] if name == b"x-profile"]
+    flags += parse_qs(scope.get("query_string", b"").decode()).get("profile", [])
+    return any(flag.lower() in ("1", "true") for flag in flags)
+
+
+def profile_functions(profiler: cProfile.Profile, top: int = PROFILE_TOP_FUNCTIONS):
+    """The ``top`` functions of a cProfile run by cumulative time, as plain dicts."""
+
+    functions = [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "total_ms": round(total * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        }
+        for (filename, line, name), (_, calls, total, cumulative, _) in pstats.Stats(profiler).stats.items()
+    ]
+    return sorted(functions, key=lambda function: function["cumulative_ms"], reverse=True)[:top]
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling the requests that ask for it (see ``profile_requested``).
+
+    The response of a profiled request is replaced by a JSON report: the status, size and duration
+    of the real response, every SQL statement the request ran with its duration, and the functions
+    it spent the most time in, from cProfile. One request is profiled at a time per process, others
+    asking meanwhile get 409. cProfile sees everything on the event loop thread, so functions of
+    concurrent requests can show up in the report; the statements are this request's alone. Endless
+    streams (the SSE change feed) never finish, so they can't be profiled.
+    """
+
+    def __init__(self, app, top: int = PROFILE_TOP_FUNCTIONS):
+        self.app = app
+        self.top = top
+        self._busy = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if self._busy:
+            await FastJSONResponse({"detail": "Another request is being profiled. Please try again shortly."},
+                                   status_code=409)(scope, receive, send)
+            return
+
+        response = {"status_code": 500, "bytes": 0}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status_code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+
+        # Share the DB stats MetricsMiddleware set up for the request, if it runs
+        stats, token = current_request_db_stats.get(), None
+        if stats is None:
+            stats = RequestDBStats()
+            token = current_request_db_stats.set(stats)
+        stats.statements = []
+        profiler = cProfile.Profile()
+        self._busy = True
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            self._busy = False
+            statements, stats.statements = stats.statements, None
+            if token is not None:
+                current_request_db_stats.reset(token)
+
+        await FastJSONResponse({
+            "method": scope["method"],
+            "path": scope["path"],
+            "response": response,
+            "duration_ms": round(elapsed * 1000, 3),
+            "db": {
+                "queries": len(statements),
+                "duration_ms": round(sum(duration for _, duration in statements) * 1000, 3),
+                "statements": [{"sql": sql, "duration_ms": round(duration * 1000, 3)} for sql, duration in statements],
+            },
+            "functions": profile_functions(profiler, self.top),
+        })(scope, receive, send)
+
+
+@contextmanager
+def query_budget(max_queries: int, *engines):
+    """Fail with an AssertionError when the block runs more than ``max_queries`` SQL statements.
+
+    Counts every statement sent through ``engines`` (sync, async or lazy engines; by default the
+    engines of the API, on every shard) while the block runs, and yields the list of their SQL. The error lists
+    them, so a test that trips the budget shows which round trip is new.
+    """
+
+    targets = []
+    default_engines = [engine for shard in shards for engine in (shard.async_engine, shard.read_engine)]
+    for engine in engines or dict.fromkeys((*default_engines, *async_replica_engines)):
+        engine = engine.get() if isinstance(engine, LazyEngine) else engine
+        targets.append(getattr(engine, "sync_engine", engine))
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for target in targets:
+        event.listen(target, "before_cursor_execute", record_statement)
+    try:
+        yield statements
+    finally:
+        for target in targets:
+            event.remove(target, "before_cursor_execute", record_statement)
+    if len(statements) > max_queries:
+        raise AssertionError(
+            f"Expected at most {max_queries} SQL statements, ran {len(statements)}:\n" + "\n".join(statements)
+        )
@@ -1,19 +1,32 @@
 import logging
-from datetime import datetime
+from contextlib import aclosing
+from datetime import date
+from typing import Optional, Literal, List
 
-from fastapi import APIRouter, status, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, status, Depends, HTTPException, Query, Body, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
-from log_config import setup_logging
-from schemas import ProjectCreate, ProjectUpdate
+from change_feed import parse_cursor, format_cursor, advance_cursor, latest_positions, subscribe_all
+from conditional import date_time_field, project_etag, projects_list_etag, etag_matches
+from database import get_async_db, get_async_read_db, get_async_shard_dbs, get_async_shard_read_dbs
+from fast_json import FastJSONResponse, dumps
+from import_export import render_csv, parse_csv, parse_ndjson, import_project_records
+from schemas import ProjectCreate, ProjectUpdate, ProjectFilter, ProjectBulkUpdate, ProjectBulkDelete
+from schemas import MessageResponse, ProjectResponse, ProjectListResponse, ProjectSearchResponse, BulkResponse
+from schemas import ProjectStatsResponse, ProjectChangesResponse, ProjectImportResponse
+from services import BULK_BATCH_SIZE
+from services import bulk_create_projects_service
+from services import sharded_bulk_update_projects_service, sharded_bulk_delete_projects_service
 from services import create_project_service
 from services import delete_project_service
-from services import get_projects_service, get_project_by_id_service
+from services import sharded_projects_service, get_project_by_id_service, sharded_stream_projects_service
+from services import sharded_projects_version_service
+from services import sharded_search_projects_service
+from services import sharded_project_stats_service, sharded_timeline_service
 from services import update_project_service
 
-# Set up logging
-setup_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize the router
@@ -23,14 +36,15 @@ projects_router = APIRouter(
 )
 
 
-@projects_router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
+@projects_router.post("/", response_model=ProjectResponse, response_model_exclude_unset=True,
+                      status_code=status.HTTP_201_CREATED)
+async def create_project(project: ProjectCreate, db: AsyncSession = Depends(get_async_db)):
     try:
-        created_project = create_project_service(db=db, project=project)
+        created_project = await create_project_service(db=db, project=project)
         return {
             "message": f"Project created successfully. Project ID: {created_project.id}.",
             "project": created_project.to_dict(),
-            "date_time": datetime.now().isoformat(),
+            **date_time_field(),
         }
     except HTTPException as e:
         # Reraise the exception that was raised in the service
@@ -43,15 +57,41 @@ async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
         )
 
 
-@projects_router.get("/", response_model=dict, status_code=status.HTTP_200_OK)
-async def get_projects(db: Session = Depends(get_db)):
+async def _ndjson_projects(dbs: List[AsyncSession], after: Optional[int], filters: ProjectFilter):
+    """Render streamed project chunks as newline-delimited JSON."""
+
+    async for chunk in sharded_stream_projects_service(dbs=dbs, after=after, filters=filters):
+        yield b"".join(dumps(dict(project)) + b"\n" for project in chunk)
+
+
+@projects_router.get("/", response_model=ProjectListResponse, status_code=status.HTTP_200_OK)
+async def get_projects(
+        request: Request,
+        limit: int = Query(100, ge=1, le=1000),
+        after: Optional[int] = Query(None, ge=0),
+        format: Literal["json", "ndjson"] = "json",
+        filters: ProjectFilter = Depends(),
+        if_none_match: Optional[str] = Header(None),
+        dbs: List[AsyncSession] = Depends(get_async_shard_read_dbs),
+):
+    if format == "ndjson":
+        # Stream every matching row; memory stays bounded by the chunk size
+        return StreamingResponse(_ndjson_projects(dbs=dbs, after=after, filters=filters),
+                                 media_type="application/x-ndjson")
     try:
-        projects = get_projects_service(db=db)
-        return {
+        versions = await sharded_projects_version_service(dbs=dbs, limit=limit, after=after, filters=filters)
+        etag = projects_list_etag(versions, query=str(request.url.query))
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        projects = await sharded_projects_service(dbs=dbs, limit=limit, after=after, filters=filters)
+        # Rows are rendered as they come from the database; see FastJSONResponse
+        return FastJSONResponse({
             "message": "Successfully fetched the list of projects.",
-            "projects": [project.to_dict() for project in projects],
-            "date_time": datetime.now().isoformat(),
-        }
+            "projects": [dict(project) for project in projects],
+            "next_after": projects[-1]["id"] if len(projects) == limit else None,
+            **date_time_field(),
+        }, headers=headers)
     except HTTPException as e:
         # Reraise the exception that was raised in the service
         raise e
@@ -63,21 +103,348 @@ async def get_projects(db: Session = Depends(get_db)):
         )
 
 
+@projects_router.get("/search", response_model=ProjectSearchResponse, status_code=status.HTTP_200_OK)
+async def search_projects(
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(20, ge=1, le=100),
+        dbs: List[AsyncSession] = Depends(get_async_shard_read_dbs),
+):
+    """Full-text search over project names and descriptions.
+
+    Every word of ``q`` must match the start of a word in the project; results are ranked by relevance.
+    """
+    try:
+        projects = await sharded_search_projects_service(dbs=dbs, q=q, limit=limit)
+        return FastJSONResponse({
+            "message": f"Found {len(projects)} projects matching '{q}'.",
+            "projects": [dict(project) for project in projects],
+            **date_time_field(),
+        })
+    except HTTPException as e:
+        # Reraise the exception that was raised in the service
+        raise e
+    except Exception as e:
+        logger.error(f"Error searching projects: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to search projects at the moment. Please try again later.",
+        )
+
+
+@projects_router.get("/stats", response_model=ProjectStatsResponse, status_code=status.HTTP_200_OK)
+async def get_project_stats(dbs: List[AsyncSession] = Depends(get_async_shard_read_dbs)):
+    try:
+        stats = await sharded_project_stats_service(dbs=dbs)
+        return FastJSONResponse({
+            "message": "Successfully fetched project statistics.",
+            "stats": stats,
+            **date_time_field(),
+        })
+    except HTTPException as e:
+        # Reraise the exception that was raised in the service
+        raise e
+    except Exception as e:
+        logger.error(f"Error fetching project statistics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to retrieve project statistics at the moment. Please try again later.",
+        )
+
+
+@projects_router.get("/timeline", response_model=ProjectListResponse, status_code=status.HTTP_200_OK)
+async def get_project_timeline(
+        on: Optional[date] = None,
+        start: Optional[date] = Query(None, alias="from"),
+        end: Optional[date] = Query(None, alias="to"),
+        limit: int = Query(100, ge=1, le=1000),
+        after: Optional[int] = Query(None, ge=0),
+        dbs: List[AsyncSession] = Depends(get_async_shard_read_dbs),
+):
+    """Projects running on the date ``on``, or at any point between ``from`` and ``to``.
+
+    Either bound of the range may be left out to leave it open. Results are in id order and paged
+    with ``after`` like GET /projects/.
+    """
+    if on is not None and (start is not None or end is not None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Pass either 'on' or a 'from'/'to' range, not both.")
+    if on is None and start is None and end is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Pass a date with 'on', or a range with 'from' and/or 'to'.")
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must not be after 'to'.")
+    try:
+        start, end = (on, on) if on is not None else (start or date.min, end or date.max)
+        projects = await sharded_timeline_service(dbs=dbs, start=start, end=end, limit=limit, after=after)
+        return FastJSONResponse({
+            "message": f"Found {len(projects)} projects running between {start} and {end}.",
+            "projects": [dict(project) for project in projects],
+            "next_after": projects[-1]["id"] if len(projects) == limit else None,
+            **date_time_field(),
+        })
+    except HTTPException as e:
+        # Reraise the exception that was raised in the service
+        raise e
+    except Exception as e:
+        logger.error(f"Error fetching the project timeline: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to retrieve the project timeline at the moment. Please try again later.",
+        )
+
+
+async def _sse_changes(positions: List[int]):
+    """Render change feed batches as Server-Sent Events, with keep-alive comments while idle."""
+
+    # Close the subscription as soon as the client goes away, not when it is garbage collected
+    async with aclosing(subscribe_all(positions)) as subscription:
+        async for events in subscription:
+            if not events:
+                yield b": keep-alive\n\n"
+                continue
+            chunk = []
+            for event in events:
+                # The ID is the cursor after the event, so a reconnect resumes every shard
+                positions = advance_cursor(positions, [event])
+                chunk.append(b"id: %s\nevent: %s\ndata: %s\n\n" % (
+                    format_cursor(positions).encode(), event["operation"].encode(), dumps(event)))
+            yield b"".join(chunk)
+
+
+@projects_router.get("/changes", response_model=ProjectChangesResponse, status_code=status.HTTP_200_OK)
+async def get_project_changes(
+        after: Optional[str] = None,
+        format: Literal["sse", "json"] = "sse",
+        timeout: float = Query(30, ge=0, le=60),
+        last_event_id: Optional[str] = Header(None),
+):
+    """Stream project creates, updates and deletes in commit order.
+
+    Every event has a sequence number; resume with ``after`` (or the ``Last-Event-ID`` header EventSource
+    sends on reconnect) to get every event after it. Without either, only new events are sent.
+    ``format=json`` long-polls instead: it waits up to ``timeout`` seconds for events after ``after``.
+    With several shards, positions are cursors (see change_feed.py) rather than sequence numbers.
+    """
+    try:
+        cursor = after if after is not None else last_event_id
+        try:
+            positions = parse_cursor(cursor) if cursor is not None else await latest_positions()
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="'after' must be a position returned by the change feed.")
+        if format == "sse":
+            return StreamingResponse(_sse_changes(positions=positions), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        async with aclosing(subscribe_all(positions, heartbeat=timeout)) as subscription:
+            changes = await anext(subscription)
+        return FastJSONResponse({
+            "message": f"Fetched {len(changes)} project changes.",
+            "changes": changes,
+            "cursor": format_cursor(advance_cursor(positions, changes)),
+            "last_seq": changes[-1]["seq"] if changes else (positions[0] if len(positions) == 1 else None),
+            **date_time_field(),
+        })
+    except HTTPException as e:
+        # Reraise the exception that was raised in the service
+        raise e
+    except Exception as e:
+        logger.error(f"Error fetching project changes: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to retrieve project changes at the moment. Please try again later.",
+        )
+
+
+@projects_router.get("/export", status_code=status.HTTP_200_OK)
+async def export_projects(
+        format: Literal["csv", "ndjson"] = "csv",
+        after: Optional[int] = Query(None, ge=0),
+        filters: ProjectFilter = Depends(),
+        dbs: List[AsyncSession] = Depends(get_async_shard_read_dbs),
+):
+    """Download every matching project as CSV or NDJSON, streamed from a database cursor.
+
+    Rows come in ID order; an interrupted export can be resumed with ``after`` set to the last ID received.
+    """
+    if format == "csv":
+        body = render_csv(sharded_stream_projects_service(dbs=dbs, after=after, filters=filters))
+        media_type = "text/csv"
+    else:
+        body = _ndjson_projects(dbs=dbs, after=after, filters=filters)
+        media_type = "application/x-ndjson"
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="projects.{format}"'})
+
+
+@projects_router.post("/import", response_model=ProjectImportResponse, status_code=status.HTTP_200_OK)
+async def import_projects(
+        request: Request,
+        format: Optional[Literal["csv", "ndjson"]] = None,
+        batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=5000),
+        db: AsyncSession = Depends(get_async_db),
+):
+    """Create projects from a CSV (with a header row) or NDJSON upload, read as it arrives.
+
+    Without ``format`` it is taken from the Content-Type. Invalid lines are reported and skipped;
+    valid projects are committed in batches of ``batch_size``.
+    """
+    try:
+        if format is None:
+            format = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "ndjson"
+        parse = parse_csv if format == "csv" else parse_ndjson
+        imported, rejected, errors = await import_project_records(db=db, records=parse(request.stream()),
+                                                                  batch_size=batch_size)
+        return FastJSONResponse({
+            "message": f"Import finished: {imported} projects created, {rejected} lines rejected.",
+            "imported": imported,
+            "rejected": rejected,
+            "errors": errors,
+            **date_time_field(),
+        })
+    except HTTPException as e:
+        # Reraise the exception that was raised in the service
+        raise e
+    except Exception as e:
+        logger.error(f"Error importing projects: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to import the projects. Please verify the data and try again.",
+        )
+
+
+def _validate_bulk_items(items: List[dict], schema):
+    """Validate each raw item on its own so one bad row doesn't reject the whole batch.
+
+    Returns the ``(index, model)`` pairs that passed and the results for the ones that didn't.
+    """
+
+    valid, rejected = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as e:
+            rejected.append({
+                "index": index,
+                "status": "invalid",
+                "errors": [{"loc": list(error["loc"]), "msg": error["msg"]} for error in e.errors()],
+            })
+    return valid, rejected
+
+
+@projects_router.post("/bulk", response_model=BulkResponse, response_model_exclude_unset=True,
+                      status_code=status.HTTP_200_OK)
+async def bulk_create_projects(
+        projects: List[dict] = Body(...),
+        batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=5000),
+        db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        valid, results = _validate_bulk_items(projects, ProjectCreate)
+        project_ids = await bulk_create_projects_service(db=db, projects=[project for _, project in valid],
+                                                         batch_size=batch_size)
+        results += [
+            {"index": index, "status": "created", "id": project_id}
+            for (index, _), project_id in zip(valid, project_ids)
+        ]
+        results.sort(key=lambda result: result["index"])
+        return {
+            "message": f"Bulk create processed {len(projects)} projects: "
+                       f"{len(project_ids)} created, {len(projects) - len(project_ids)} rejected.",
+            "results": results,
+            **date_time_field(),
+        }
+    except HTTPException as e:
+        # Reraise the exception that was raised in the service
+        raise e
+    except Exception as e:
+        logger.error(f"Error bulk creating projects: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create the projects. Please verify the data and try again.",
+        )
+
 
-@projects_router.get("/{project_id}", response_model=dict, status_code=status.HTTP_200_OK)
-async def get_project_by_id(project_id: int, db: Session = Depends(get_db)):
+@projects_router.patch("/bulk", response_model=BulkResponse, response_model_exclude_unset=True,
+                       status_code=status.HTTP_200_OK)
+async def bulk_update_projects(
+        projects: List[dict] = Body(...),
+        batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=5000),
+        dbs: List[AsyncSession] = Depends(get_async_shard_dbs),
+):
     try:
-        project = get_project_by_id_service(db=db, project_id=project_id)
+        valid, results = _validate_bulk_items(projects, ProjectBulkUpdate)
+        found = await sharded_bulk_update_projects_service(dbs=dbs, projects=[project for _, project in valid],
+                                                           batch_size=batch_size)
+        results += [
+            {"index": index, "status": "updated" if exists else "not_found", "id": project.id}
+            for (index, project), exists in zip(valid, found)
+        ]
+        results.sort(key=lambda result: result["index"])
+        return {
+            "message": f"Bulk update processed {len(projects)} projects: {sum(found)} updated, "
+                       f"{len(found) - sum(found)} not found, {len(projects) - len(found)} rejected.",
+            "results": results,
+            **date_time_field(),
+        }
+    except HTTPException as e:
+        # Reraise the exception that was raised in the service
+        raise e
+    except Exception as e:
+        logger.error(f"Error bulk updating projects: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update the projects. Please verify the data and try again.",
+        )
+
+
+@projects_router.delete("/bulk", response_model=BulkResponse, response_model_exclude_unset=True,
+                        status_code=status.HTTP_200_OK)
+async def bulk_delete_projects(
+        payload: ProjectBulkDelete,
+        batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=5000),
+        dbs: List[AsyncSession] = Depends(get_async_shard_dbs),
+):
+    try:
+        found = await sharded_bulk_delete_projects_service(dbs=dbs, project_ids=payload.ids,
+                                                           batch_size=batch_size)
+        return {
+            "message": f"Bulk delete processed {len(found)} projects: {sum(found)} deleted, "
+                       f"{len(found) - sum(found)} not found.",
+            "results": [
+                {"index": index, "status": "deleted" if exists else "not_found", "id": project_id}
+                for index, (project_id, exists) in enumerate(zip(payload.ids, found))
+            ],
+            **date_time_field(),
+        }
+    except HTTPException as e:
+        # Reraise the exception that was raised in the service
+        raise e
+    except Exception as e:
+        logger.error(f"Error bulk deleting projects: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to delete the projects. Please try again later.",
+        )
+
+
+@projects_router.get("/{project_id}", response_model=ProjectResponse, status_code=status.HTTP_200_OK)
+async def get_project_by_id(project_id: int, if_none_match: Optional[str] = Header(None),
+                            db: AsyncSession = Depends(get_async_read_db)):
+    try:
+        project = await get_project_by_id_service(db=db, project_id=project_id)
         if not project:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Project with ID {project_id} not found. Please ensure the ID is correct and try again.",
             )
-        return {
+        headers = {"ETag": project_etag(project["id"], project["updated_at"]), "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return FastJSONResponse({
             "message": f"Project with ID {project_id} retrieved successfully.",
-            "project": project.to_dict(),
-            "date_time": datetime.now().isoformat(),
-        }
+            "project": project,
+            **date_time_field(),
+        }, headers=headers)
     except HTTPException as e:
         # Reraise the exception that was raised in the service
         raise e
@@ -89,19 +456,23 @@ async def get_project_by_id(project_id: int, db: Session = Depends(get_db)):
         )
 
 
-@projects_router.put("/{project_id}", response_model=dict, status_code=status.HTTP_200_OK)
-async def update_project(project_id: int, project: ProjectUpdate, db: Session = Depends(get_db)):
+@projects_router.put("/{project_id}", response_model=ProjectResponse, response_model_exclude_unset=True,
+                     status_code=status.HTTP_200_OK)
+async def update_project(project_id: int, project: ProjectUpdate, response: Response,
+                         if_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_async_db)):
     try:
-        updated_project = update_project_service(db=db, project_id=project_id, project=project)
+        updated_project = await update_project_service(db=db, project_id=project_id, project=project,
+                                                       if_match=if_match)
         if not updated_project:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Failed to update project with ID {project_id}. Please verify the data and try again.",
             )
+        response.headers["ETag"] = project_etag(updated_project.id, updated_project.updated_at)
         return {
             "message": f"Project with ID {project_id} updated successfully.",
             "project": updated_project.to_dict(),
-            "date_time": datetime.now().isoformat(),
+            **date_time_field(),
         }
     except HTTPException as e:
         # Reraise the exception that was raised in the service
@@ -114,10 +485,12 @@ async def update_project(project_id: int, project: ProjectUpdate, db: Session =
         )
 
 
-@projects_router.delete("/{project_id}", response_model=dict, status_code=status.HTTP_200_OK)
-async def delete_project(project_id: int, db: Session = Depends(get_db)):
+@projects_router.delete("/{project_id}", response_model=MessageResponse, response_model_exclude_unset=True,
+                        status_code=status.HTTP_200_OK)
+async def delete_project(project_id: int, if_match: Optional[str] = Header(None),
+                         db: AsyncSession = Depends(get_async_db)):
     try:
-        success = delete_project_service(db=db, project_id=project_id)
+        success = await delete_project_service(db=db, project_id=project_id, if_match=if_match)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -125,7 +498,7 @@ async def delete_project(project_id: int, db: Session = Depends(get_db)):
             )
         return {
             "message": f"Project with ID {project_id} deleted successfully.",
-            "date_time": datetime.now().isoformat(),
+            **date_time_field(),
         }
     except HTTPException as e:
         # Reraise the exception that was raised in the service
@@ -1,5 +1,5 @@
-from datetime import date
-from typing import Optional
+from datetime import date, datetime
+from typing import Optional, List, Literal
 
 from pydantic import BaseModel
 
@@ -16,3 +16,118 @@ class ProjectUpdate(BaseModel):
     project_description: Optional[str] = None
     project_start_date: Optional[date] = None
     project_end_date: Optional[date] = None
+
+
+class ProjectFilter(BaseModel):
+    is_active: Optional[bool] = None
+    start_date_from: Optional[date] = None
+    start_date_to: Optional[date] = None
+    end_date_from: Optional[date] = None
+    end_date_to: Optional[date] = None
+
+
+class ProjectBulkUpdate(ProjectUpdate):
+    id: int
+
+
+class ProjectBulkDelete(BaseModel):
+    ids: List[int]
+
+
+class ProjectOut(BaseModel):
+    id: Optional[int] = None
+    project_name: Optional[str] = None
+    project_description: Optional[str] = None
+    project_start_date: Optional[date] = None
+    project_end_date: Optional[date] = None
+    is_active: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    deleted_at: Optional[datetime] = None
+
+
+class MessageResponse(BaseModel):
+    message: str
+    date_time: Optional[str] = None
+
+
+class ProjectResponse(BaseModel):
+    message: str
+    project: ProjectOut
+    date_time: Optional[str] = None
+
+
+class ProjectListResponse(BaseModel):
+    message: str
+    projects: List[ProjectOut]
+    next_after: Optional[int] = None
+    date_time: Optional[str] = None
+
+
+class ProjectSearchResponse(BaseModel):
+    message: str
+    projects: List[ProjectOut]
+    date_time: Optional[str] = None
+
+
+class MonthCount(BaseModel):
+    month: Optional[str] = None
+    total: int
+    active: int
+
+
+class ProjectStats(BaseModel):
+    total: int
+    active: int
+    inactive: int
+    overdue: int
+    by_start_month: List[MonthCount]
+
+
+class ProjectStatsResponse(BaseModel):
+    message: str
+    stats: ProjectStats
+    date_time: Optional[str] = None
+
+
+class ProjectChangeEvent(BaseModel):
+    seq: int
+    operation: Literal["create", "update", "delete"]
+    project_id: int
+    changed_at: Optional[datetime] = None
+    project: Optional[ProjectOut] = None
+
+
+class ProjectChangesResponse(BaseModel):
+    message: str
+    changes: List[ProjectChangeEvent]
+    # Where to resume from (``after``); with a single shard, the same as last_seq
+    cursor: str
+    last_seq: Optional[int] = None
+    date_time: Optional[str] = None
+
+
+class ImportLineError(BaseModel):
+    line: int
+    errors: List[dict]
+
+
+class ProjectImportResponse(BaseModel):
+    message: str
+    imported: int
+    rejected: int
+    errors: List[ImportLineError]
+    date_time: Optional[str] = None
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str
+    id: Optional[int] = None
+    errors: Optional[List[dict]] = None
+
+
+class BulkResponse(BaseModel):
+    message: str
+    results: List[BulkItemResult]
+    date_time: Optional[str] = None
@@ -0,0 +1,101 @@
+"""Production launcher.
+
+Sets up the database schema once, then serves the app from ``--workers`` uvicorn worker processes
+with reload off. Deployments that migrate the schema separately pass ``--skip-schema-check`` (or set
+``DB_SCHEMA_READY=true``), so neither the launcher nor the workers touch it on boot. uvloop and
+httptools are used when they are installed (``pip install uvloop httptools``), the pure-Python
+event loop and HTTP parser otherwise.
+
+With several workers, state that lives in one process can't be shared: the project cache is turned
+off unless it is the ``shared`` backend with a ``PROJECT_CACHE_URL`` (a per-process cache would keep
+serving a project, and its ETag, after another worker changed it), and the archival job runs once,
+in the launcher, instead of in every worker.
+
+On SIGINT/SIGTERM the workers stop accepting connections, let in-flight requests finish for up to
+``--graceful-timeout`` seconds and run the app's shutdown (flushing queued group-commit writes)
+before exiting.
+
+Usage:
+    python serve.py --workers 4 --port 8181
+"""
+import argparse
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+
+import uvicorn
+
+from archival import ARCHIVE_INTERVAL, archive_periodically
+from log_config import setup_logging
+from models import init_db
+
+logger = logging.getLogger(__name__)
+
+
+def fastest_available(*candidates):
+    """Return the first uvicorn implementation whose module is installed."""
+
+    for name, module in candidates:
+        if module is None or importlib.util.find_spec(module) is not None:
+            return name
+
+
+def configure_workers(workers: int):
+    """Adjust the environment the workers inherit so that ``workers`` processes stay consistent.
+
+    Returns True when the launcher should run the archival job itself.
+    """
+
+    if workers <= 1:
+        return False
+    backend = os.getenv("PROJECT_CACHE_BACKEND", "memory").lower()
+    if backend != "none" and not (backend == "shared" and os.getenv("PROJECT_CACHE_URL")):
+        logger.warning(f"The {backend} project cache is per process, so workers would serve stale projects; "
+                       "it is disabled. Set PROJECT_CACHE_BACKEND=shared and PROJECT_CACHE_URL to cache.")
+        os.environ["PROJECT_CACHE_BACKEND"] = "none"
+    # One archiver, not one per worker competing for the write lock
+    os.environ["ARCHIVE_INTERVAL_SECONDS"] = "0"
+    return ARCHIVE_INTERVAL > 0
+
+
+def main(args):
+    setup_logging()
+
+    if not args.skip_schema_check:
+        # Create or migrate the schema once, before any worker exists; workers skip it
+        init_db()
+    os.environ["DB_SCHEMA_READY"] = "true"
+    if configure_workers(args.workers):
+        threading.Thread(target=asyncio.run, args=(archive_periodically(),), name="archival", daemon=True).start()
+
+    loop = fastest_available(("uvloop", "uvloop"), ("asyncio", None))
+    http = fastest_available(("httptools", "httptools"), ("h11", None))
+    logger.info(f"Starting {args.workers} workers on {args.host}:{args.port} (loop={loop}, http={http})")
+    uvicorn.run(
+        "main_app:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reload=False,
+        loop=loop,
+        http=http,
+        backlog=args.backlog,
+        access_log=args.access_log,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8181")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--graceful-timeout", type=float, default=30)
+    parser.add_argument("--access-log", action="store_true", help="log every request (off by default)")
+    parser.add_argument("--skip-schema-check", action="store_true",
+                        default=os.getenv("DB_SCHEMA_READY", "false").lower() == "true",
+                        help="don't create or migrate the schema on startup")
+    main(parser.parse_args())
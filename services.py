@@ -1,19 +1,65 @@
+import asyncio
+import heapq
 import logging
+import re
+from datetime import date, timedelta
+from typing import Optional, List
 
 from fastapi import status, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, delete, func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from log_config import setup_logging
-from models import ProjectManagementSystem
-from schemas import ProjectCreate, ProjectUpdate
+from cache import project_cache
+from database import SHARD_ID_BITS, shard_index
+from conditional import project_etag, etag_matches
+from group_commit import group_committer_for
+from metrics import service_errors
+from models import ProjectManagementSystem, ProjectArchive, ProjectChange, project_search, utcnow
+from models import project_month_counts, project_end_date_counts, project_timeline
+from schemas import ProjectCreate, ProjectUpdate, ProjectFilter, ProjectBulkUpdate
 
-# Set up logging
-setup_logging()
 logger = logging.getLogger(__name__)
 
+# Default number of rows written per statement by the bulk services
+BULK_BATCH_SIZE = 500
 
-def create_project_service(db: Session, project: ProjectCreate):
+# Soft-deleted projects keep their row until archived; every read and write skips them
+LIVE = ProjectManagementSystem.deleted_at.is_(None)
+
+# Read paths select these columns and return plain row mappings instead of ORM instances
+PROJECT_COLUMNS = tuple(ProjectManagementSystem.__table__.columns)
+
+EPOCH = date(1970, 1, 1)
+# Id span of the first window a timeline page is read from, per requested row
+TIMELINE_WINDOW_PER_ROW = 8
+
+
+def _batched(items, batch_size: int):
+    """Split a list into consecutive slices of at most ``batch_size`` items."""
+
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+async def _invalidate_cached(*project_ids):
+    """Drop cached copies of projects after their write committed.
+
+    A cache error is only logged: the write has succeeded, and failing the request would make the
+    client retry it. Stale entries expire with the cache TTL.
+    """
+
+    try:
+        await project_cache.delete(*project_ids)
+    except Exception as e:
+        logger.error(f"Error invalidating cached projects after a committed write: {str(e)}")
+
+
+async def create_project_service(db: AsyncSession, project: ProjectCreate):
     try:
+        group_committer = group_committer_for(db)
+        if group_committer is not None:
+            # Share a transaction with concurrent writes; see group_commit.py
+            return await group_committer.create(project.model_dump())
         db_project = ProjectManagementSystem(
             project_name=project.project_name,
             project_description=project.project_description,
@@ -21,10 +67,11 @@ def create_project_service(db: Session, project: ProjectCreate):
             project_end_date=project.project_end_date,
         )
         db.add(db_project)
-        db.commit()
-        db.refresh(db_project)
+        await db.commit()
+        await db.refresh(db_project)
         return db_project
     except Exception as e:
+        service_errors.inc("create_project_service")
         logger.error(f"Error in create_project_service: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -32,10 +79,37 @@ def create_project_service(db: Session, project: ProjectCreate):
         )
 
 
-def get_projects_service(db: Session):
+def _build_projects_query(after: Optional[int] = None, filters: Optional[ProjectFilter] = None):
+    """Build a keyset-ordered projects query, optionally resuming after a given ID."""
+
+    query = select(*PROJECT_COLUMNS).where(LIVE).order_by(ProjectManagementSystem.id)
+    if after is not None:
+        query = query.where(ProjectManagementSystem.id > after)
+    if filters is None:
+        return query
+    if filters.is_active is not None:
+        query = query.where(ProjectManagementSystem.is_active == filters.is_active)
+    if filters.start_date_from is not None:
+        query = query.where(ProjectManagementSystem.project_start_date >= filters.start_date_from)
+    if filters.start_date_to is not None:
+        query = query.where(ProjectManagementSystem.project_start_date <= filters.start_date_to)
+    if filters.end_date_from is not None:
+        query = query.where(ProjectManagementSystem.project_end_date >= filters.end_date_from)
+    if filters.end_date_to is not None:
+        query = query.where(ProjectManagementSystem.project_end_date <= filters.end_date_to)
+    return query
+
+
+async def get_projects_service(db: AsyncSession, limit: Optional[int] = None, after: Optional[int] = None,
+                               filters: Optional[ProjectFilter] = None):
     try:
-        return db.query(ProjectManagementSystem).all()
+        query = _build_projects_query(after=after, filters=filters)
+        if limit is not None:
+            query = query.limit(limit)
+        result = await db.execute(query)
+        return result.mappings().all()
     except Exception as e:
+        service_errors.inc("get_projects_service")
         logger.error(f"Error in get_projects_service: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -43,10 +117,262 @@ def get_projects_service(db: Session):
         )
 
 
-def get_project_by_id_service(db: Session, project_id: int):
+async def get_projects_version_service(db: AsyncSession, limit: Optional[int] = None, after: Optional[int] = None,
+                                       filters: Optional[ProjectFilter] = None):
+    """Return ``(row_count, max_id, max_updated_at)`` for a page without loading its rows."""
+
+    try:
+        query = _build_projects_query(after=after, filters=filters)
+        if limit is not None:
+            query = query.limit(limit)
+        page = query.subquery()
+        result = await db.execute(select(func.count(), func.max(page.c.id), func.max(page.c.updated_at)))
+        return tuple(result.one())
+    except Exception as e:
+        service_errors.inc("get_projects_version_service")
+        logger.error(f"Error in get_projects_version_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to retrieve projects at the moment. Please try again later.",
+        )
+
+
+# Search terms are reduced to words, so user input can't inject FTS5 query syntax
+SEARCH_TERM = re.compile(r"\w+")
+# Upper bound on the number of matches ranked per search
+SEARCH_RANK_CANDIDATES = 5000
+
+
+def search_match_expression(q: str) -> str:
+    """Turn free text into an FTS5 query matching projects that contain every word as a prefix."""
+
+    return " ".join(f'"{term}"*' for term in SEARCH_TERM.findall(q))
+
+
+async def search_projects_service(db: AsyncSession, q: str, limit: int = 20,
+                                  rank_candidates: int = SEARCH_RANK_CANDIDATES, scored: bool = False):
+    """Return the row mappings of the best matches for ``q``, best first.
+
+    Matches are ranked with BM25, weighting hits in the project name above hits in the description.
+    Only the first ``rank_candidates`` live matches are ranked, which bounds the cost of short prefixes
+    that match most of the table; selective queries are ranked in full. ``scored`` adds the BM25
+    ``score`` (lower is better) to the rows.
+    """
+
     try:
-        return db.query(ProjectManagementSystem).filter(ProjectManagementSystem.id == project_id).first()
+        match = search_match_expression(q)
+        if not match:
+            return []
+        projects = ProjectManagementSystem.__table__
+        # Soft-deleted projects stay indexed until they are archived; they are skipped before the LIMIT,
+        # so they can't use up the candidates
+        candidates = (
+            select(project_search.c.rowid, func.bm25(literal_column("projects_fts"), 10.0, 1.0).label("score"))
+            .join(projects, projects.c.id == project_search.c.rowid)
+            .where(literal_column("projects_fts").op("MATCH")(match), LIVE)
+            .limit(rank_candidates)
+            .subquery()
+        )
+        query = (
+            select(*PROJECT_COLUMNS, *([candidates.c.score] if scored else []))
+            .select_from(projects.join(candidates, candidates.c.rowid == projects.c.id))
+            .where(LIVE)
+            .order_by(candidates.c.score, projects.c.id)
+            .limit(limit)
+        )
+        result = await db.execute(query)
+        return result.mappings().all()
     except Exception as e:
+        service_errors.inc("search_projects_service")
+        logger.error(f"Error in search_projects_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to search projects at the moment. Please try again later.",
+        )
+
+
+async def get_project_stats_service(db: AsyncSession, today: Optional[date] = None):
+    """Aggregate live projects from the trigger-maintained count tables.
+
+    Costs one read per count group (start month, end date), however many projects there are.
+    Projects are overdue when they are active and their end date is before ``today``.
+    """
+
+    try:
+        today = today or date.today()
+        result = await db.execute(
+            select(project_month_counts.c.start_month, project_month_counts.c.is_active, project_month_counts.c.count)
+            .where(project_month_counts.c.count > 0)
+            .order_by(project_month_counts.c.start_month)
+        )
+        totals = {"total": 0, "active": 0, "inactive": 0}
+        months = {}
+        for start_month, is_active, count in result.all():
+            state = "active" if is_active else "inactive"
+            totals["total"] += count
+            totals[state] += count
+            month = months.setdefault(start_month or None, {"month": start_month or None, "total": 0, "active": 0})
+            month["total"] += count
+            if is_active:
+                month["active"] += count
+        result = await db.execute(
+            select(func.coalesce(func.sum(project_end_date_counts.c.count), 0))
+            .where(project_end_date_counts.c.end_date != "",
+                   project_end_date_counts.c.end_date < today.isoformat(),
+                   project_end_date_counts.c.is_active == 1)
+        )
+        return {**totals, "overdue": result.scalar(), "by_start_month": list(months.values())}
+    except Exception as e:
+        service_errors.inc("get_project_stats_service")
+        logger.error(f"Error in get_project_stats_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to retrieve project statistics at the moment. Please try again later.",
+        )
+
+
+def timeline_day(day: date) -> int:
+    """Days since 1970-01-01, the unit of the ``projects_timeline`` index."""
+
+    return (day - EPOCH).days
+
+
+async def get_timeline_service(db: AsyncSession, start: date, end: date, limit: int = 100,
+                               after: Optional[int] = None):
+    """Return the row mappings of live projects whose dates overlap ``[start, end]``, in id order.
+
+    A project overlaps when it starts on or before ``end`` and ends on or after ``start``; a missing
+    date leaves its side open. Candidates come from the ``projects_timeline`` R*Tree one id window at
+    a time, starting at ``limit * TIMELINE_WINDOW_PER_ROW`` ids past ``after``; each further window is
+    sized from the share of overlapping ids seen so far. A page reads about a page of the index over a
+    busy range and a few windows over a sparse one; neither scans the table.
+    """
+
+    try:
+        first_id, last_id = (await db.execute(
+            select(func.min(ProjectManagementSystem.id), func.max(ProjectManagementSystem.id))
+        )).one()
+        # Skip the ids below the first project, e.g. those of the other shards
+        position = max(after or 0, (first_id or 1) - 1)
+        last_id = last_id or 0
+        # The index holds ids as offsets within the shard
+        base = last_id >> SHARD_ID_BITS << SHARD_ID_BITS
+        window = limit * TIMELINE_WINDOW_PER_ROW
+        projects = []
+        while len(projects) < limit and position < last_id:
+            overlapping = select(project_timeline.c.id).where(
+                project_timeline.c.min_id > position - base,
+                project_timeline.c.max_id <= position + window - base,
+                project_timeline.c.start_day <= timeline_day(end),
+                project_timeline.c.end_day >= timeline_day(start),
+            )
+            result = await db.execute(
+                select(*PROJECT_COLUMNS)
+                .where(ProjectManagementSystem.id.in_(overlapping), LIVE)
+                .order_by(ProjectManagementSystem.id)
+                .limit(limit - len(projects))
+            )
+            rows = result.mappings().all()
+            projects.extend(rows)
+            position += window
+            # Enough ids for the rest of the page at the density just seen, with a margin; at least double
+            expected = window * (limit - len(projects)) * 3 // (2 * len(rows)) if rows else window * limit
+            window = max(window * 2, expected)
+        return projects
+    except Exception as e:
+        service_errors.inc("get_timeline_service")
+        logger.error(f"Error in get_timeline_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to retrieve the project timeline at the moment. Please try again later.",
+        )
+
+
+async def get_changes_service(db: AsyncSession, after: int = 0, limit: int = 500):
+    """Return up to ``limit`` change-log entries with ``seq > after``, oldest first.
+
+    Each entry carries the project's current columns (NULL once it is deleted), so one query serves
+    a whole batch of events.
+    """
+
+    try:
+        projects = ProjectManagementSystem.__table__
+        result = await db.execute(
+            select(ProjectChange.seq, ProjectChange.operation, ProjectChange.changed_at,
+                   ProjectChange.project_id, *PROJECT_COLUMNS)
+            .select_from(ProjectChange.__table__.outerjoin(
+                projects, (projects.c.id == ProjectChange.project_id) & LIVE
+            ))
+            .where(ProjectChange.seq > after)
+            .order_by(ProjectChange.seq)
+            .limit(limit)
+        )
+        return result.mappings().all()
+    except Exception as e:
+        service_errors.inc("get_changes_service")
+        logger.error(f"Error in get_changes_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to retrieve project changes at the moment. Please try again later.",
+        )
+
+
+async def get_latest_change_seq_service(db: AsyncSession) -> int:
+    """Return the sequence number of the newest change-log entry, or 0 when there is none."""
+
+    try:
+        result = await db.execute(select(func.coalesce(func.max(ProjectChange.seq), 0)))
+        return result.scalar()
+    except Exception as e:
+        service_errors.inc("get_latest_change_seq_service")
+        logger.error(f"Error in get_latest_change_seq_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to retrieve project changes at the moment. Please try again later.",
+        )
+
+
+async def stream_projects_service(db: AsyncSession, after: Optional[int] = None,
+                                  filters: Optional[ProjectFilter] = None, chunk_size: int = 500):
+    """Yield project row mappings in chunks of ``chunk_size`` from a server-side cursor."""
+
+    try:
+        query = _build_projects_query(after=after, filters=filters).execution_options(yield_per=chunk_size)
+        result = await db.stream(query)
+        async for chunk in result.mappings().partitions(chunk_size):
+            yield chunk
+    except Exception as e:
+        service_errors.inc("stream_projects_service")
+        logger.error(f"Error in stream_projects_service: {str(e)}")
+        raise
+
+
+async def _select_project(db: AsyncSession, project_id: int):
+    result = await db.execute(
+        select(ProjectManagementSystem).where(ProjectManagementSystem.id == project_id, LIVE)
+    )
+    return result.scalars().first()
+
+
+async def get_project_by_id_service(db: AsyncSession, project_id: int):
+    """Read-through lookup returning the project's row as a plain dict, or None."""
+
+    try:
+        cached = await project_cache.get(project_id)
+        if cached is not None:
+            return cached
+        generation = await project_cache.generation()
+        result = await db.execute(select(*PROJECT_COLUMNS).where(ProjectManagementSystem.id == project_id, LIVE))
+        row = result.mappings().first()
+        if row is None:
+            return None
+        project = dict(row)
+        if db.info.get("replica") is not True:
+            # A lagging replica could cache a row older than a write that already invalidated it
+            await project_cache.set(project_id, project, generation)
+        return project
+    except Exception as e:
+        service_errors.inc("get_project_by_id_service")
         logger.error(f"Error in get_project_by_id_service for project ID {project_id}: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -54,23 +380,60 @@ def get_project_by_id_service(db: Session, project_id: int):
         )
 
 
-def update_project_service(db: Session, project_id: int, project: ProjectUpdate):
+async def _check_if_match(db: AsyncSession, project_id: int, if_match: Optional[str]) -> bool:
+    """Enforce an ``If-Match`` precondition inside the current write transaction.
+
+    Returns False when the project doesn't exist and raises 412 when its ETag doesn't match.
+    Without a precondition nothing is read, keeping writes to a single round trip.
+    """
+
+    if if_match is None:
+        return True
+    result = await db.execute(
+        select(ProjectManagementSystem).where(ProjectManagementSystem.id == project_id, LIVE).with_for_update()
+    )
+    db_project = result.scalars().first()
+    if not db_project:
+        return False
+    if not etag_matches(if_match, project_etag(db_project.id, db_project.updated_at)):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"Project with ID {project_id} has been modified. Please fetch it again and retry.",
+        )
+    return True
+
+
+async def update_project_service(db: AsyncSession, project_id: int, project: ProjectUpdate,
+                                 if_match: Optional[str] = None):
+    """Update a project with a single ``UPDATE ... RETURNING`` statement."""
+
     try:
-        db_project = get_project_by_id_service(db=db, project_id=project_id)
+        if not await _check_if_match(db=db, project_id=project_id, if_match=if_match):
+            return None
+        # Empty values are ignored
+        changes = {key: value for key, value in project.model_dump().items() if value}
+        if not changes:
+            return await _select_project(db=db, project_id=project_id)
+        group_committer = group_committer_for(db)
+        if group_committer is not None and if_match is None:
+            return await group_committer.update(project_id, changes)
+        result = await db.execute(
+            update(ProjectManagementSystem)
+            .where(ProjectManagementSystem.id == project_id, LIVE)
+            .values(**changes)
+            .returning(ProjectManagementSystem)
+        )
+        db_project = result.scalars().first()
         if not db_project:
+            await db.rollback()
             return None
-        if project.project_name:
-            db_project.project_name = project.project_name
-        if project.project_description:
-            db_project.project_description = project.project_description
-        if project.project_start_date:
-            db_project.project_start_date = project.project_start_date
-        if project.project_end_date:
-            db_project.project_end_date = project.project_end_date
-        db.commit()
-        db.refresh(db_project)
+        await db.commit()
+        await _invalidate_cached(project_id)
         return db_project
+    except HTTPException as e:
+        raise e
     except Exception as e:
+        service_errors.inc("update_project_service")
         logger.error(f"Error in update_project_service for project ID {project_id}: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -78,17 +441,369 @@ def update_project_service(db: Session, project_id: int, project: ProjectUpdate)
         )
 
 
-def delete_project_service(db: Session, project_id: int):
+async def delete_project_service(db: AsyncSession, project_id: int, if_match: Optional[str] = None):
+    """Soft-delete a project with a single ``UPDATE ... RETURNING id`` statement.
+
+    The row stays in ``projects`` with ``deleted_at`` set until the archival job moves it out.
+    """
+
     try:
-        db_project = get_project_by_id_service(db=db, project_id=project_id)
-        if not db_project:
+        if not await _check_if_match(db=db, project_id=project_id, if_match=if_match):
+            return False
+        result = await db.execute(
+            update(ProjectManagementSystem)
+            .where(ProjectManagementSystem.id == project_id, LIVE)
+            .values(is_active=False, deleted_at=utcnow())
+            .returning(ProjectManagementSystem.id)
+        )
+        if result.scalars().first() is None:
+            await db.rollback()
             return False
-        db.delete(db_project)
-        db.commit()
+        await db.commit()
+        await _invalidate_cached(project_id)
         return True
+    except HTTPException as e:
+        raise e
     except Exception as e:
+        service_errors.inc("delete_project_service")
         logger.error(f"Error in delete_project_service for project ID {project_id}: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Unable to delete project with ID {project_id}. Please try again later.",
         )
+
+
+async def bulk_create_projects_service(db: AsyncSession, projects: List[ProjectCreate],
+                                       batch_size: int = BULK_BATCH_SIZE):
+    """Insert projects with one multi-row INSERT per batch and a single commit.
+
+    Returns the new project IDs in the same order as ``projects``.
+    """
+
+    try:
+        project_ids = []
+        for batch in _batched(projects, batch_size):
+            statement = insert(ProjectManagementSystem).values([project.model_dump() for project in batch])
+            result = await db.execute(statement.returning(ProjectManagementSystem.id))
+            # RETURNING has no defined order, but the transaction holds the write lock, so the rows got
+            # ascending IDs in the order of the VALUES list
+            project_ids.extend(sorted(result.scalars().all()))
+        await db.commit()
+        return project_ids
+    except Exception as e:
+        await db.rollback()
+        service_errors.inc("bulk_create_projects_service")
+        logger.error(f"Error in bulk_create_projects_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create the projects. Please verify the data and try again.",
+        )
+
+
+async def import_projects_service(db: AsyncSession, projects: List[ProjectCreate]) -> int:
+    """Insert projects with one executemany INSERT and commit; returns how many were inserted.
+
+    Unlike ``bulk_create_projects_service`` it doesn't return the new IDs, so the whole import is one
+    statement regardless of its size.
+    """
+
+    try:
+        await db.execute(insert(ProjectManagementSystem), [project.model_dump() for project in projects])
+        await db.commit()
+        return len(projects)
+    except Exception as e:
+        await db.rollback()
+        service_errors.inc("import_projects_service")
+        logger.error(f"Error in import_projects_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to import the projects. Please verify the data and try again.",
+        )
+
+
+async def bulk_update_projects_service(db: AsyncSession, projects: List[ProjectBulkUpdate],
+                                       batch_size: int = BULK_BATCH_SIZE):
+    """Apply partial updates by primary key in batches within a single transaction.
+
+    Returns one flag per item telling whether the project existed.
+    """
+
+    try:
+        found = []
+        for batch in _batched(projects, batch_size):
+            result = await db.execute(
+                select(ProjectManagementSystem.id)
+                .where(ProjectManagementSystem.id.in_([p.id for p in batch]), LIVE)
+            )
+            existing_ids = set(result.scalars().all())
+            rows = []
+            for project in batch:
+                found.append(project.id in existing_ids)
+                # Empty values are ignored, as in update_project_service
+                changes = {key: value for key, value in project.model_dump(exclude={"id"}).items() if value}
+                if project.id in existing_ids and changes:
+                    rows.append({"id": project.id, **changes})
+            if rows:
+                await db.execute(update(ProjectManagementSystem), rows)
+        await db.commit()
+        await _invalidate_cached(*(project.id for project in projects))
+        return found
+    except Exception as e:
+        await db.rollback()
+        service_errors.inc("bulk_update_projects_service")
+        logger.error(f"Error in bulk_update_projects_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update the projects. Please verify the data and try again.",
+        )
+
+
+async def bulk_delete_projects_service(db: AsyncSession, project_ids: List[int],
+                                       batch_size: int = BULK_BATCH_SIZE):
+    """Soft-delete projects in batches within a single transaction.
+
+    Returns one flag per ID telling whether the project existed.
+    """
+
+    try:
+        deleted_ids = set()
+        deleted_at = utcnow()
+        for batch in _batched(project_ids, batch_size):
+            result = await db.execute(
+                update(ProjectManagementSystem)
+                .where(ProjectManagementSystem.id.in_(batch), LIVE)
+                .values(is_active=False, deleted_at=deleted_at)
+                .returning(ProjectManagementSystem.id)
+            )
+            deleted_ids.update(result.scalars().all())
+        await db.commit()
+        await _invalidate_cached(*deleted_ids)
+        return [project_id in deleted_ids for project_id in project_ids]
+    except Exception as e:
+        await db.rollback()
+        service_errors.inc("bulk_delete_projects_service")
+        logger.error(f"Error in bulk_delete_projects_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to delete the projects. Please try again later.",
+        )
+
+
+async def archive_deleted_projects_service(db: AsyncSession, older_than: timedelta,
+                                           batch_size: int = BULK_BATCH_SIZE, max_batches: Optional[int] = None):
+    """Move projects soft-deleted more than ``older_than`` ago into ``projects_archive``.
+
+    Each batch of at most ``batch_size`` rows is copied and removed in its own short transaction,
+    so the job never holds the write lock for long. Returns the number of archived projects.
+    """
+
+    try:
+        cutoff = utcnow() - older_than
+        columns = [column.name for column in PROJECT_COLUMNS]
+        archived = batches = 0
+        while max_batches is None or batches < max_batches:
+            result = await db.execute(
+                select(ProjectManagementSystem.id)
+                .where(ProjectManagementSystem.deleted_at < cutoff)
+                .order_by(ProjectManagementSystem.deleted_at)
+                .limit(batch_size)
+            )
+            project_ids = result.scalars().all()
+            if not project_ids:
+                break
+            # An ID reused by a database created before IDs were AUTOINCREMENT may already be archived;
+            # the newer project replaces it rather than failing this batch on every run
+            await db.execute(
+                insert(ProjectArchive).prefix_with("OR REPLACE", dialect="sqlite").from_select(
+                    columns, select(*PROJECT_COLUMNS).where(ProjectManagementSystem.id.in_(project_ids))
+                )
+            )
+            await db.execute(delete(ProjectManagementSystem).where(ProjectManagementSystem.id.in_(project_ids)))
+            await db.commit()
+            archived += len(project_ids)
+            batches += 1
+            if len(project_ids) < batch_size:
+                break
+        return archived
+    except Exception as e:
+        await db.rollback()
+        service_errors.inc("archive_deleted_projects_service")
+        logger.error(f"Error in archive_deleted_projects_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to archive deleted projects. Please try again later.",
+        )
+
+
+async def prune_changes_service(db: AsyncSession, older_than: timedelta, batch_size: int = BULK_BATCH_SIZE):
+    """Delete change-log entries older than ``older_than`` in batches; returns the number removed.
+
+    Sequence numbers are never reused, so clients resuming from a pruned position just miss the
+    pruned entries.
+    """
+
+    try:
+        cutoff = utcnow() - older_than
+        pruned = 0
+        while True:
+            batch = select(ProjectChange.seq).where(ProjectChange.changed_at < cutoff).limit(batch_size)
+            result = await db.execute(delete(ProjectChange).where(ProjectChange.seq.in_(batch)))
+            await db.commit()
+            pruned += result.rowcount
+            if result.rowcount < batch_size:
+                break
+        return pruned
+    except Exception as e:
+        await db.rollback()
+        service_errors.inc("prune_changes_service")
+        logger.error(f"Error in prune_changes_service: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unable to prune project changes. Please try again later.",
+        )
+
+
+# Sharded services: projects are spread over the shards by ID range (see database.Shard), so the
+# reads below query every shard concurrently and merge the per-shard results in ID order, and the
+# bulk writes split their items by shard. They take one session per shard, in shard order (see
+# get_async_shard_dbs / get_async_shard_read_dbs); with a single shard they are the plain services.
+
+async def _gather(*calls):
+    """Await service calls on different shards concurrently; raise the first failure once all are done."""
+
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+def _merge_by_id(pages, limit: Optional[int] = None):
+    """Merge per-shard pages sorted by ID into the first ``limit`` rows overall."""
+
+    merged = heapq.merge(*pages, key=lambda row: row["id"])
+    return list(merged) if limit is None else [row for row, _ in zip(merged, range(limit))]
+
+
+def _shards_after(dbs: List[AsyncSession], after: Optional[int]):
+    """The sessions of the shards that can hold IDs greater than ``after``, in shard order."""
+
+    if after is None:
+        return dbs
+    return dbs[shard_index(after):]
+
+
+async def sharded_projects_service(dbs: List[AsyncSession], limit: Optional[int] = None,
+                                   after: Optional[int] = None, filters: Optional[ProjectFilter] = None):
+    if len(dbs) == 1:
+        return await get_projects_service(db=dbs[0], limit=limit, after=after, filters=filters)
+    pages = await _gather(*(get_projects_service(db=db, limit=limit, after=after, filters=filters)
+                            for db in _shards_after(dbs, after)))
+    return _merge_by_id(pages, limit)
+
+
+async def sharded_projects_version_service(dbs: List[AsyncSession], limit: Optional[int] = None,
+                                           after: Optional[int] = None, filters: Optional[ProjectFilter] = None):
+    """Return the page version of every shard (see ``get_projects_version_service``), in shard order.
+
+    Each covers the shard's own page of ``limit`` rows, so together they cover the merged page.
+    """
+
+    return await _gather(*(get_projects_version_service(db=db, limit=limit, after=after, filters=filters)
+                           for db in _shards_after(dbs, after)))
+
+
+async def sharded_stream_projects_service(dbs: List[AsyncSession], after: Optional[int] = None,
+                                          filters: Optional[ProjectFilter] = None, chunk_size: int = 500):
+    """Yield chunks of project row mappings of every shard in turn; shards hold consecutive ID ranges,
+    so the rows come in ID order."""
+
+    for db in _shards_after(dbs, after):
+        async for chunk in stream_projects_service(db=db, after=after, filters=filters, chunk_size=chunk_size):
+            yield chunk
+
+
+async def sharded_search_projects_service(dbs: List[AsyncSession], q: str, limit: int = 20,
+                                          rank_candidates: int = SEARCH_RANK_CANDIDATES):
+    """Merge the best matches of every shard by BM25 score.
+
+    Each shard scores against its own term statistics, so with shards of very different contents
+    the merged ranking is an approximation of a single index's.
+    """
+
+    if len(dbs) == 1:
+        return await search_projects_service(db=dbs[0], q=q, limit=limit, rank_candidates=rank_candidates)
+    pages = await _gather(*(search_projects_service(db=db, q=q, limit=limit, rank_candidates=rank_candidates,
+                                                    scored=True) for db in dbs))
+    merged = heapq.merge(*pages, key=lambda row: (row["score"], row["id"]))
+    return [{key: value for key, value in row.items() if key != "score"} for row, _ in zip(merged, range(limit))]
+
+
+async def sharded_project_stats_service(dbs: List[AsyncSession], today: Optional[date] = None):
+    if len(dbs) == 1:
+        return await get_project_stats_service(db=dbs[0], today=today)
+    today = today or date.today()
+    results = await _gather(*(get_project_stats_service(db=db, today=today) for db in dbs))
+    stats = {"total": 0, "active": 0, "inactive": 0, "overdue": 0}
+    months = {}
+    for result in results:
+        for key in stats:
+            stats[key] += result[key]
+        for month in result["by_start_month"]:
+            merged = months.setdefault(month["month"], {"month": month["month"], "total": 0, "active": 0})
+            merged["total"] += month["total"]
+            merged["active"] += month["active"]
+    # Projects without a start date first, as on a single database
+    by_start_month = sorted(months.values(), key=lambda month: (month["month"] is not None, month["month"] or ""))
+    return {**stats, "by_start_month": by_start_month}
+
+
+async def sharded_timeline_service(dbs: List[AsyncSession], start: date, end: date, limit: int = 100,
+                                   after: Optional[int] = None):
+    if len(dbs) == 1:
+        return await get_timeline_service(db=dbs[0], start=start, end=end, limit=limit, after=after)
+    pages = await _gather(*(get_timeline_service(db=db, start=start, end=end, limit=limit, after=after)
+                            for db in _shards_after(dbs, after)))
+    return _merge_by_id(pages, limit)
+
+
+def _split_by_shard(dbs: List[AsyncSession], items, project_id):
+    """Group ``items`` by the shard of ``project_id(item)``: ``{shard index: [(position, item), ...]}``."""
+
+    groups = {}
+    for position, item in enumerate(items):
+        groups.setdefault(min(shard_index(project_id(item)), len(dbs) - 1), []).append((position, item))
+    return groups
+
+
+async def _sharded_bulk_write(dbs: List[AsyncSession], items, project_id, write):
+    """Run ``write(db, items)`` on every shard holding some of ``items``; reassemble the flags in input order.
+
+    Each shard commits on its own: if one fails, the others' changes stay.
+    """
+
+    if len(dbs) == 1:
+        return await write(dbs[0], items)
+    groups = _split_by_shard(dbs, items, project_id)
+    results = await _gather(*(write(dbs[index], [item for _, item in group]) for index, group in groups.items()))
+    found = [False] * len(items)
+    for group, flags in zip(groups.values(), results):
+        for (position, _), flag in zip(group, flags):
+            found[position] = flag
+    return found
+
+
+async def sharded_bulk_update_projects_service(dbs: List[AsyncSession], projects: List[ProjectBulkUpdate],
+                                               batch_size: int = BULK_BATCH_SIZE):
+    return await _sharded_bulk_write(
+        dbs, projects, lambda project: project.id,
+        lambda db, items: bulk_update_projects_service(db=db, projects=items, batch_size=batch_size),
+    )
+
+
+async def sharded_bulk_delete_projects_service(dbs: List[AsyncSession], project_ids: List[int],
+                                               batch_size: int = BULK_BATCH_SIZE):
+    return await _sharded_bulk_write(
+        dbs, project_ids, lambda project_id: project_id,
+        lambda db, items: bulk_delete_projects_service(db=db, project_ids=items, batch_size=batch_size),
+    )
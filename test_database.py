@@ -0,0 +1,99 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from database import SQLITE_PROFILES, configure_sqlite_engine
+from models import Base
+from schemas import ProjectCreate
+from services import archive_deleted_projects_service, create_project_service, delete_project_service
+
+# projects as created before it used AUTOINCREMENT, as in databases that predate it
+LEGACY_PROJECTS_DDL = """CREATE TABLE projects (
+    id INTEGER NOT NULL, project_name VARCHAR, project_description VARCHAR, project_start_date DATE,
+    project_end_date DATE, is_active BOOLEAN, created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), deleted_at DATETIME, PRIMARY KEY (id)
+)"""
+
+
+def project(name):
+    return ProjectCreate(project_name=name, project_description="Description",
+                         project_start_date=date(2024, 1, 1), project_end_date=date(2024, 12, 31))
+
+
+# Schema Tests --> A Table Without AUTOINCREMENT Is Rebuilt, So Archived IDs Aren't Reused
+def test_legacy_projects_table_never_reuses_ids(tmp_path):
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    schema_engine = create_engine(url)
+    with schema_engine.begin() as connection:
+        connection.exec_driver_sql(LEGACY_PROJECTS_DDL)
+        connection.exec_driver_sql("INSERT INTO projects (id, project_name) VALUES (1, 'Kept')")
+    Base.metadata.create_all(bind=schema_engine)
+    with schema_engine.connect() as connection:
+        assert "AUTOINCREMENT" in connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE name = 'projects'").scalar()
+        assert connection.exec_driver_sql("SELECT project_name FROM projects").scalars().all() == ["Kept"]
+    with schema_engine.begin() as connection:
+        # An ID the old table already handed out twice, before the rebuild
+        connection.exec_driver_sql("INSERT INTO projects_archive (id, project_name) VALUES (2, 'Reused')")
+
+    async def scenario():
+        engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1), poolclass=NullPool)
+        sessions = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        ids = []
+        try:
+            for name in ("First", "Second"):
+                async with sessions() as db:
+                    created = await create_project_service(db, project(name))
+                    ids.append(created.id)
+                    assert await delete_project_service(db, created.id)
+                    assert await archive_deleted_projects_service(db, older_than=timedelta(0)) == 1
+        finally:
+            await engine.dispose()
+        return ids
+
+    # The newest project was archived, yet the next one gets a new ID; the clash left from before the
+    # rebuild doesn't block archival
+    assert asyncio.run(scenario()) == [2, 3]
+    with schema_engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT id, project_name FROM projects_archive ORDER BY id").all() == [
+            (2, "First"), (3, "Second")]
+    schema_engine.dispose()
+
+
+# SQLite Profile Tests --> Production Profile On The Write And Read Engines
+def test_production_profile(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'profile.db'}"
+    profile = SQLITE_PROFILES["production"]
+    write_engine = configure_sqlite_engine(create_async_engine(url, poolclass=NullPool), profile)
+    read_engine = configure_sqlite_engine(create_async_engine(url, poolclass=NullPool), profile, read_only=True)
+    statements = []
+    event.listen(write_engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    async def scenario():
+        try:
+            async with write_engine.begin() as connection:
+                await connection.execute(text("CREATE TABLE t (x INTEGER)"))
+                pragmas = [(await connection.execute(text(f"PRAGMA {name}"))).scalar()
+                           for name in ("journal_mode", "busy_timeout", "synchronous", "query_only")]
+            async with read_engine.connect() as connection:
+                read_only = (await connection.execute(text("PRAGMA query_only"))).scalar()
+                with pytest.raises(OperationalError, match="readonly"):
+                    await connection.execute(text("INSERT INTO t VALUES (1)"))
+        finally:
+            await write_engine.dispose()
+            await read_engine.dispose()
+        return pragmas, read_only
+
+    pragmas, read_only = asyncio.run(scenario())
+
+    # WAL, a 5 s busy timeout and synchronous=NORMAL (1); writes are allowed
+    assert pragmas == ["wal", 5000, 1, 0]
+    # Write transactions take the write lock up front
+    assert statements[0] == "BEGIN IMMEDIATE"
+    assert read_only == 1
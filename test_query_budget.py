@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from cache import project_cache
+from database import configure_sqlite_engine, get_async_db, get_async_read_db, sqlite_profile
+from database import get_async_shard_dbs, get_async_shard_read_dbs
+from main_app import app
+from metrics import instrument_engine
+from models import Base, ProjectManagementSystem
+from profiling import ProfilingMiddleware, query_budget
+from services import search_projects_service
+
+
+@pytest.fixture
+def sqlite_engines(tmp_path):
+    # A real SQLite database with the full schema (indexes, triggers) and a few projects
+    url = f"sqlite:///{tmp_path / 'budget.db'}"
+    schema_engine = create_engine(url)
+    Base.metadata.create_all(bind=schema_engine)
+    with schema_engine.begin() as connection:
+        connection.execute(ProjectManagementSystem.__table__.insert(), [
+            {"project_name": f"Project {i}", "project_description": "Description", "is_active": True}
+            for i in range(1, 21)
+        ])
+    schema_engine.dispose()
+    # Set up like the app's write and read engines; NullPool, as every request of the TestClient
+    # runs on its own event loop
+    yield tuple(
+        instrument_engine(configure_sqlite_engine(
+            create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1), poolclass=NullPool),
+            sqlite_profile, read_only=read_only,
+        ), name, track_pool=False)
+        for name, read_only in (("budget-write", False), ("budget-read", True))
+    )
+
+
+@pytest.fixture
+def client(sqlite_engines):
+    def sessions_of(engine, as_list=False):
+        sessions = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+        async def override():
+            async with sessions() as db:
+                yield [db] if as_list else db
+        return override
+
+    asyncio.run(project_cache.clear())
+    app.dependency_overrides[get_async_db] = sessions_of(sqlite_engines[0])
+    app.dependency_overrides[get_async_read_db] = sessions_of(sqlite_engines[1])
+    app.dependency_overrides[get_async_shard_dbs] = sessions_of(sqlite_engines[0], as_list=True)
+    app.dependency_overrides[get_async_shard_read_dbs] = sessions_of(sqlite_engines[1], as_list=True)
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    asyncio.run(project_cache.clear())
+
+
+# Query Budget Tests --> Update Is One Round Trip
+def test_update_project_query_budget(client, sqlite_engines):
+    # BEGIN IMMEDIATE, then UPDATE ... RETURNING
+    with query_budget(2, *sqlite_engines):
+        response = client.put("/projects/3", json={"project_name": "Renamed"})
+    assert response.status_code == 200
+
+    # An If-Match precondition adds one locked read
+    with query_budget(3, *sqlite_engines):
+        response = client.put("/projects/3", json={"project_name": "Renamed again"},
+                              headers={"If-Match": response.headers["ETag"]})
+    assert response.status_code == 200
+
+
+# Query Budget Tests --> Bulk Create Is One INSERT Per Batch
+def test_bulk_create_query_budget(client, sqlite_engines):
+    projects = [{"project_name": f"Bulk {i}", "project_description": "Description",
+                 "project_start_date": "2024-01-01", "project_end_date": "2024-12-31"} for i in range(50)]
+
+    # BEGIN IMMEDIATE, then two INSERT ... RETURNING of 25 rows
+    with query_budget(3, *sqlite_engines):
+        response = client.post("/projects/bulk?batch_size=25", json=projects)
+
+    results = response.json()["results"]
+    assert [result["id"] for result in results] == list(range(21, 71))
+    assert client.get("/projects/70").json()["project"]["project_name"] == "Bulk 49"
+
+
+# Query Budget Tests --> List Page Is Its Version Plus Its Rows
+def test_list_projects_query_budget(client, sqlite_engines):
+    with query_budget(2, *sqlite_engines):
+        response = client.get("/projects/?limit=5&after=10")
+    assert [project["id"] for project in response.json()["projects"]] == [11, 12, 13, 14, 15]
+
+    with query_budget(1, *sqlite_engines):
+        response = client.get("/projects/?limit=5&after=10", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+
+# Query Budget Tests --> Cached Project Reads Skip The Database
+def test_get_project_query_budget(client, sqlite_engines):
+    with query_budget(1, *sqlite_engines):
+        assert client.get("/projects/7").status_code == 200
+    with query_budget(0, *sqlite_engines):
+        assert client.get("/projects/7").status_code == 200
+
+
+# Search Tests --> Soft-Deleted Matches Don't Use Up The Ranked Candidates
+def test_search_skips_soft_deleted_candidates(sqlite_engines):
+    async def scenario():
+        sessions = async_sessionmaker(bind=sqlite_engines[0], autoflush=False, expire_on_commit=False)
+        async with sessions() as db:
+            # Deleted projects stay in the search index until they are archived
+            await db.execute(update(ProjectManagementSystem).where(ProjectManagementSystem.id <= 15)
+                             .values(is_active=False, deleted_at=func.now()))
+            await db.commit()
+            return await search_projects_service(db, "project", limit=20, rank_candidates=10)
+
+    assert sorted(row["id"] for row in asyncio.run(scenario())) == [16, 17, 18, 19, 20]
+
+
+# Query Budget Tests --> Exceeding The Budget Lists The Statements
+def test_query_budget_exceeded(client, sqlite_engines):
+    with pytest.raises(AssertionError, match=r"at most 1 SQL statements, ran 2:\nSELECT count"):
+        with query_budget(1, *sqlite_engines):
+            client.get("/projects/")
+
+
+# Profiling Tests --> Profiled Request Reports Its Statements And Functions
+def test_profile_request(sqlite_engines, client):
+    profiled = TestClient(ProfilingMiddleware(app, top=1000))
+
+    response = profiled.get("/projects/7", headers={"X-Profile": "1"})
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["response"]["status_code"] == 200
+    assert report["db"]["queries"] == 1
+    assert report["db"]["statements"][0]["sql"].startswith("SELECT projects.id")
+    assert any("get_project_by_id_service" in function["function"] for function in report["functions"])
+    # Without the flag the request is served as usual
+    assert profiled.get("/projects/7").json()["project"]["id"] == 7
@@ -0,0 +1,125 @@
+import asyncio
+import itertools
+
+import httpx
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import database
+from cache import project_cache
+from database import SHARD_CAPACITY, SHARD_ID_BITS, Shard
+from main_app import app
+from models import init_shard
+
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch):
+    # Two real SQLite shards instead of the configured database
+    shards = [Shard(index, f"sqlite:///{tmp_path / f'shard-{index}.db'}") for index in range(2)]
+    for shard in shards:
+        init_shard(shard)
+    monkeypatch.setattr(database, "shards", shards)
+    monkeypatch.setattr(database, "_next_shard", itertools.cycle(shards))
+    # Shard 0 reads go to the primary or its replicas; here there are none
+    monkeypatch.setattr(database, "AsyncPrimaryReadSessionLocal", shards[0].read_sessions)
+    monkeypatch.setattr(database, "_next_replica", itertools.repeat(shards[0].read_sessions))
+    # Other test modules leave their overrides in place
+    app.dependency_overrides.clear()
+    asyncio.run(project_cache.clear())
+    yield shards
+    asyncio.run(project_cache.clear())
+
+
+def project_payload(name):
+    return {"project_name": name, "project_description": "Description",
+            "project_start_date": "2024-01-01", "project_end_date": "2024-12-31"}
+
+
+def run_requests(shards, requests):
+    """Run ``requests(client)`` against the app in one event loop, then close the shards' connections."""
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await requests(client)
+        finally:
+            for shard in shards:
+                for engine in (shard.async_engine, shard.read_engine):
+                    if engine.created:
+                        await engine.get().dispose()
+    return asyncio.run(run())
+
+
+# Sharding Tests --> Creates Alternate Shards With Shard-Encoded IDs
+def test_create_projects_across_shards(shards):
+    async def requests(client):
+        return [(await client.post("/projects/", json=project_payload(f"Project {i}"))).json()["project"]["id"]
+                for i in range(4)]
+
+    ids = run_requests(shards, requests)
+
+    assert ids == [1, (1 << SHARD_ID_BITS) + 1, 2, (1 << SHARD_ID_BITS) + 2]
+    for shard in shards:
+        with shard.engine.get().connect() as connection:
+            assert connection.exec_driver_sql("SELECT count(*) FROM projects").scalar() == 2
+
+
+# Sharding Tests --> Single-Project Requests Go To The Project's Shard
+def test_project_requests_are_routed(shards):
+    second = (1 << SHARD_ID_BITS) + 1
+
+    async def requests(client):
+        for i in range(2):
+            await client.post("/projects/", json=project_payload(f"Project {i}"))
+        updated = await client.put(f"/projects/{second}", json={"project_name": "Renamed"})
+        deleted = await client.delete("/projects/1")
+        return updated, deleted, await client.get(f"/projects/{second}"), await client.get("/projects/1")
+
+    updated, deleted, found, missing = run_requests(shards, requests)
+
+    assert updated.status_code == 200 and deleted.status_code == 200
+    assert found.json()["project"]["project_name"] == "Renamed"
+    assert missing.status_code == 404
+
+
+# Sharding Tests --> Lists Merge The Shards In ID Order
+def test_list_projects_merges_shards(shards):
+    async def requests(client):
+        await client.post("/projects/bulk", json=[project_payload(f"Project {i}") for i in range(3)])
+        await client.post("/projects/bulk", json=[project_payload(f"Project {i}") for i in range(3, 5)])
+        first = (await client.get("/projects/?limit=4")).json()
+        second = (await client.get(f"/projects/?limit=4&after={first['next_after']}")).json()
+        stats = (await client.get("/projects/stats")).json()["stats"]
+        return first, second, stats
+
+    first, second, stats = run_requests(shards, requests)
+
+    on_second_shard = 1 << SHARD_ID_BITS
+    assert [project["id"] for project in first["projects"]] == [1, 2, 3, on_second_shard + 1]
+    assert [project["id"] for project in second["projects"]] == [on_second_shard + 2]
+    assert second["next_after"] is None
+    assert stats["total"] == 5
+
+
+# Sharding Tests --> The Timeline Indexes IDs Up To The Shard's Capacity
+def test_timeline_high_shard_ids(shards):
+    last = shards[1].last_id
+    assert last == (1 << SHARD_ID_BITS) + SHARD_CAPACITY
+    insert = ("INSERT INTO projects (id, project_name, project_description, project_start_date, project_end_date) "
+              "VALUES (?, 'High', 'Description', '2024-01-01', '2024-12-31')")
+    with shards[1].engine.get().begin() as connection:
+        connection.exec_driver_sql(insert, (last,))
+    # Offsets past 31 bits would wrap in the index, so they're refused
+    for project_id in (last + 1, (1 << SHARD_ID_BITS) + (1 << 35) + 5):
+        with pytest.raises(IntegrityError, match="capacity of its shard"):
+            with shards[1].engine.get().begin() as connection:
+                connection.exec_driver_sql(insert, (project_id,))
+
+    async def requests(client):
+        await client.post("/projects/", json=project_payload("Low"))
+        return (await client.get("/projects/timeline?from=2024-06-01&to=2024-06-30")).json()
+
+    timeline = run_requests(shards, requests)
+
+    assert [project["id"] for project in timeline["projects"]] == [1, last]